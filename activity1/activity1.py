@@ -1,12 +1,76 @@
+import os
+import time
 import pandas as pd
+import numpy as np
 import matplotlib.pyplot as plt
-from sklearn.cluster import KMeans
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from sklearn.cluster import KMeans, MiniBatchKMeans, DBSCAN, HDBSCAN
+from sklearn.metrics import silhouette_score
+from joblib import Parallel, delayed, effective_n_jobs
 import folium
+from folium.plugins import FastMarkerCluster
 
-def loading_data(path):
-    """Cargando los datos"""
+# unicas columnas que usa el pipeline y su tipo compacto
+COLUMNAS_ECOBICI = {
+    'latitud': 'float32',
+    'longitud': 'float32',
+    'num_cicloe': 'category',
+    'calle_prin': 'category',
+    'colonia': 'category',
+}
+
+def _read_csv_pyarrow(path):
+    """
+    leyendo el csv con el lector de pyarrow: solo las columnas del pipeline,
+    coordenadas en float32 y textos como diccionario (category en pandas).
+    se usa pyarrow.csv directo porque el engine pyarrow de pandas infiere
+    num_cicloe como numero y pierde los ceros a la izquierda
+    """
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    tipos = {
+        columna: pa.float32() if tipo == 'float32' else pa.dictionary(pa.int32(), pa.string())
+        for columna, tipo in COLUMNAS_ECOBICI.items()
+    }
+    tabla = pa_csv.read_csv(
+        path,
+        read_options=pa_csv.ReadOptions(encoding='latin1'),
+        convert_options=pa_csv.ConvertOptions(include_columns=list(COLUMNAS_ECOBICI),
+                                              column_types=tipos, strings_can_be_null=True)
+    )
+    return tabla.to_pandas()
+
+def loading_data(path, engine='pyarrow', cache=True):
+    """
+    Cargando los datos
+        - solo las columnas de COLUMNAS_ECOBICI con sus tipos compactos
+        - engine: 'pyarrow' (si esta instalado) o 'c' (lector de pandas)
+        - cache: guarda el resultado en un .parquet junto al csv y lo reutiliza
+          mientras el csv no sea mas nuevo que la cache
+    """
+    cache_path = os.path.splitext(path)[0] + ".parquet"
     try:
-        df = pd.read_csv(path, encoding='latin1')
+        if cache and os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(path):
+            df = pd.read_parquet(cache_path)
+            print("Perfectly imported from cache...")
+            return df
+
+        if engine == 'pyarrow':
+            try:
+                df = _read_csv_pyarrow(path)
+            except ImportError:
+                print("pyarrow no esta instalado, usando el lector de pandas")
+                engine = 'c'
+        if engine != 'pyarrow':
+            # los textos se leen como str para no perder ceros a la izquierda
+            tipos = {columna: (str if tipo == 'category' else tipo) for columna, tipo in COLUMNAS_ECOBICI.items()}
+            df = pd.read_csv(path, encoding='latin1', usecols=list(COLUMNAS_ECOBICI), dtype=tipos)
+            df = df.astype(COLUMNAS_ECOBICI)
+
+        if cache:
+            df.to_parquet(cache_path, index=False)
         print("Perfectly imported...")
         return df
     except FileNotFoundError:
@@ -18,22 +82,27 @@ def clean_data(df):
     Como el df es de estaciones de bicicletas publicas en CDMX
     la latitud esta entre 19.0 y 19.6
     la longitud esta entre -99.0 y -99.4
-    eliminando filas con valores na
+    eliminando filas con valores na en las columnas que usa el pipeline
     """
-    df_clean = df.dropna()
+    df_clean = df.dropna(subset=[columna for columna in COLUMNAS_ECOBICI if columna in df.columns])
     mask = (df_clean["latitud"] > 18) & (df_clean['latitud'] < 20) & (df_clean['longitud'] > -100) & (df_clean['longitud'] < -98)
 
     df_clean = df_clean[mask]
     return df_clean
 
 
+# con mas puntos que esto el scatter se guarda como imagen y no como un
+# elemento vectorial por punto (importa en pdf/svg y al dibujar)
+UMBRAL_RASTER = 5_000
+
 def exploratory_plot(df, filename="plots/mapa_exploratorio2.png"):
     plt.figure(figsize=(10, 8))
     if 'Cluster' in df.columns:
-        plt.scatter(df['longitud'], df['latitud'], s=15, alpha=0.6, c=df['Cluster'], cmap='viridis')
+        plt.scatter(df['longitud'], df['latitud'], s=15, alpha=0.6, c=df['Cluster'], cmap='viridis',
+                    rasterized=len(df) > UMBRAL_RASTER)
         plt.title(f"Distribución con {df['Cluster'].nunique()} Clusters")    
     else:
-        plt.scatter(df['longitud'], df['latitud'], s=5, alpha=0.6, c='blue')
+        plt.scatter(df['longitud'], df['latitud'], s=5, alpha=0.6, c='blue', rasterized=len(df) > UMBRAL_RASTER)
         plt.title("Distribución de estaciones (df_limpio)")
     plt.xlabel("Longitud")
     plt.ylabel("Latitud")
@@ -43,20 +112,86 @@ def exploratory_plot(df, filename="plots/mapa_exploratorio2.png"):
     print("Plot guardado !")
     plt.close()
 
-def best_k(df, filename="plots/elbow_method.png"):
+# filas por lote de MiniBatchKMeans en best_k
+TAMANIO_LOTE = 4096
+
+def _fit_k(X, k, mini_batch, init='k-means++', silhouette_sample=None, n_init=None):
+    """
+    ajustando k-means para un solo k. regresa (inercia, silhouette, centroides)
+    """
+    if n_init is None:
+        # mini-batch tambien con 10 inicios: con 3 la inercia llegaba a salir 30% arriba
+        n_init = 1 if not isinstance(init, str) else 10
+    # con menos filas que un lote, mini-batch no ahorra nada y solo agrega ruido
+    if mini_batch and len(X) > TAMANIO_LOTE:
+        kmeans = MiniBatchKMeans(n_clusters=k, init=init, random_state=42, n_init=n_init, batch_size=TAMANIO_LOTE)
+    else:
+        kmeans = KMeans(n_clusters=k, init=init, random_state=42, n_init=n_init)
+    labels = kmeans.fit_predict(X)
+
+    silhouette = np.nan
+    if silhouette_sample and k > 1:
+        silhouette = silhouette_score(X, labels, sample_size=min(silhouette_sample, len(X)), random_state=42)
+    return kmeans.inertia_, silhouette, kmeans.cluster_centers_
+
+def _next_init(X, centros, n_candidatos=10, random_state=42):
+    """
+    centroides iniciales para k+1: los del k anterior mas un centroide nuevo elegido
+    como en k-means++ (entre varios candidatos, el que mas reduce la inercia)
+    """
+    rng = np.random.default_rng(random_state + len(centros))
+    distancias = np.full(len(X), np.inf)
+    for centro in centros:
+        distancias = np.minimum(distancias, ((X - centro) ** 2).sum(axis=1))
+
+    total = distancias.sum()
+    # todos los puntos ya estan sobre un centroide (coordenadas repetidas o k mayor
+    # que los puntos distintos): no hay distancias para ponderar, se elige uniforme
+    probabilidades = distancias / total if total > 0 else None
+    candidatos = rng.choice(len(X), size=n_candidatos, p=probabilidades)
+    inercias = [np.minimum(distancias, ((X - X[c]) ** 2).sum(axis=1)).sum() for c in candidatos]
+    return np.vstack([centros, X[candidatos[np.argmin(inercias)]]])
+
+def best_k(df, filename="plots/elbow_method.png", n_jobs=-1, mini_batch=None, warm_start=False, silhouette_sample=None):
     """
     Generando el grafico del codo para decidir el mejor k
+        - n_jobs: los k se calculan en paralelo con joblib (-1 = todos los nucleos)
+        - mini_batch: usar MiniBatchKMeans (None = solo si hay mas de 100k filas).
+          es una aproximacion: la inercia de cada k puede salir un poco arriba de la
+          de KMeans y eso puede mover el codo; confirmar el k elegido con mini_batch=False
+        - warm_start: cada k arranca de los centroides del k anterior con n_init=1
+          (es secuencial, pero cada ajuste es mucho mas barato)
+        - silhouette_sample: si se da, calcula silhouette sobre una muestra de ese tamaño
+    regresa un df con la inercia (y silhouette) de cada k
     """
     print("Calculando el metodo del codo...")
-    X = df[['latitud', 'longitud']]
-    inercia = []
+    # mismo espacio (metros) que clustering(method='kmeans'), para que el k elegido
+    # corresponda al modelo que configura
+    X = to_meters(df)
     rango_k = range(1, 11)
+    if mini_batch is None:
+        mini_batch = len(X) > 100_000
+
+    if warm_start:
+        resultados = []
+        init = 'k-means++'
+        for k in rango_k:
+            # comparamos el arranque desde el k anterior contra un solo k-means++
+            # y nos quedamos con el de menor inercia (2 ajustes en lugar de 10)
+            candidatos = [_fit_k(X, k, mini_batch, 'k-means++', silhouette_sample, n_init=1)]
+            if not isinstance(init, str):
+                candidatos.append(_fit_k(X, k, mini_batch, init, silhouette_sample))
+            resultado = min(candidatos, key=lambda r: r[0])
+            resultados.append(resultado)
+            init = _next_init(X, resultado[2])
+    else:
+        # Calculando k-means para cada k en paralelo
+        resultados = Parallel(n_jobs=n_jobs)(
+            delayed(_fit_k)(X, k, mini_batch, silhouette_sample=silhouette_sample) for k in rango_k
+        )
 
-    for k in rango_k:
-        # Calculando k-means para cada k
-        kmeans = KMeans(n_clusters=k, random_state=42, n_init=10)
-        kmeans.fit(X)
-        inercia.append(kmeans.inertia_) # Guardando la suma de errores al cuadrado
+    inercia = [r[0] for r in resultados] # Guardando la suma de errores al cuadrado
+    silhouette = [r[1] for r in resultados]
 
     plt.figure()
     plt.plot(rango_k, inercia, marker='o', linestyle='--')
@@ -64,34 +199,226 @@ def best_k(df, filename="plots/elbow_method.png"):
     plt.xlabel('Numero de clusters (k)')
     plt.ylabel('Inercia')
     plt.grid(True)
+    if silhouette_sample:
+        eje_silhouette = plt.gca().twinx()
+        eje_silhouette.plot(rango_k, silhouette, marker='s', color='orange')
+        eje_silhouette.set_ylabel('Silhouette (muestra)')
     
     plt.savefig(filename)
     print("Plot guardado !")
     plt.close()
+    return pd.DataFrame({'k': list(rango_k), 'inercia': inercia, 'silhouette': silhouette})
+
+# origen fijo de la proyeccion (centro de CDMX): asi las coordenadas en metros
+# no cambian cuando llegan estaciones nuevas y un modelo incremental sigue valiendo
+ORIGEN_CDMX = (19.40, -99.15)
+RADIO_TIERRA_M = 6_371_000
 
-def clustering(df, n_clusters=4):
+def to_meters(df, origin=ORIGEN_CDMX):
     """
-    creando n_clusters usando K-means y agregando
-    la columna cluster al df
+    proyectando latitud/longitud a metros (equirectangular local alrededor de origin).
+    a escala de ciudad el error es despreciable y, a diferencia de los grados,
+    un metro al norte pesa lo mismo que un metro al este
+    """
+    lat0, lon0 = np.radians(origin)
+    lat = np.radians(df['latitud'].to_numpy(dtype=float))
+    lon = np.radians(df['longitud'].to_numpy(dtype=float))
+    x = RADIO_TIERRA_M * (lon - lon0) * np.cos(lat0)
+    y = RADIO_TIERRA_M * (lat - lat0)
+    return np.column_stack([x, y])
+
+def _exploratory_figure():
+    """
+    figura del mapa exploratorio sin pyplot (canvas Agg directo) con un scatter
+    vacio que se reutiliza: cada render solo cambia sus datos
+    """
+    fig = Figure(figsize=(10, 8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    scatter = ax.scatter([], [], alpha=0.6)
+    scatter.set_cmap('viridis')
+    ax.set_xlabel("Longitud")
+    ax.set_ylabel("Latitud")
+    ax.grid(True)
+    return fig, ax, scatter
+
+def _render_exploratory(figura, df, filename):
+    """
+    mismo plot que exploratory_plot pero actualizando el scatter de figura
+    """
+    fig, ax, scatter = figura
+    xy = df[['longitud', 'latitud']].to_numpy(dtype=float)
+    scatter.set_offsets(xy)
+    if 'Cluster' in df.columns and len(df):
+        clusters = df['Cluster'].to_numpy()
+        scatter.set_sizes([15])
+        scatter.set_array(clusters)
+        scatter.set_clim(clusters.min(), clusters.max())
+        ax.set_title(f"Distribución con {df['Cluster'].nunique()} Clusters")
+    else:
+        scatter.set_sizes([5])
+        scatter.set_array(None)
+        scatter.set_facecolor('blue')
+        ax.set_title("Distribución de estaciones (df_limpio)")
+    scatter.set_rasterized(len(xy) > UMBRAL_RASTER)
+
+    # los limites se recalculan solo con los datos nuevos
+    ax.ignore_existing_data_limits = True
+    ax.update_datalim(xy)
+    ax.autoscale_view()
+    fig.savefig(filename)
+
+def _elbow_figure():
+    """
+    figura del metodo del codo reutilizable: una linea de inercia y otra de silhouette
+    """
+    fig = Figure()
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    linea_inercia, = ax.plot([], [], marker='o', linestyle='--')
+    ax.set_title('Método del Codo: ¿Cuántos perfiles existen?')
+    ax.set_xlabel('Numero de clusters (k)')
+    ax.set_ylabel('Inercia')
+    ax.grid(True)
+    eje_silhouette = ax.twinx()
+    linea_silhouette, = eje_silhouette.plot([], [], marker='s', color='orange')
+    eje_silhouette.set_ylabel('Silhouette (muestra)')
+    return fig, ax, linea_inercia, eje_silhouette, linea_silhouette
+
+def _render_elbow(figura, resultados, filename):
+    """
+    mismo plot que best_k a partir del df que regresa best_k
+    """
+    fig, ax, linea_inercia, eje_silhouette, linea_silhouette = figura
+    linea_inercia.set_data(resultados['k'], resultados['inercia'])
+    ax.relim()
+    ax.autoscale_view()
+    con_silhouette = resultados['silhouette'].notna().any()
+    eje_silhouette.set_visible(con_silhouette)
+    if con_silhouette:
+        linea_silhouette.set_data(resultados['k'], resultados['silhouette'])
+        eje_silhouette.relim()
+        eje_silhouette.autoscale_view()
+    fig.savefig(filename)
+
+_RENDERERS = {
+    'exploratory': (_exploratory_figure, _render_exploratory),
+    'elbow': (_elbow_figure, _render_elbow),
+}
+
+def _render_chunk(kind, jobs):
+    """
+    renderizando un bloque de plots con una sola figura (lo que hace cada proceso)
+    """
+    crear_figura, render = _RENDERERS[kind]
+    figura = crear_figura()
+    for datos, filename in jobs:
+        render(figura, datos, filename)
+    return len(jobs)
+
+def batch_plots(jobs, kind='exploratory', n_jobs=1):
+    """
+    Generando muchos plots de una vez (reportes por ciudad/dia)
+        - jobs: lista de (datos, filename); para kind='exploratory' datos es el df
+          de estaciones y para kind='elbow' el df que regresa best_k
+        - cada proceso crea una sola figura y solo actualiza sus datos entre plots
+        - n_jobs: reparte los plots en bloques entre procesos (-1 = todos los nucleos)
+    regresa el throughput en figuras por segundo
+    """
+    inicio = time.perf_counter()
+    n_jobs = min(effective_n_jobs(n_jobs), max(len(jobs), 1))
+    if n_jobs == 1:
+        total = _render_chunk(kind, jobs)
+    else:
+        bloques = [jobs[i::n_jobs] for i in range(n_jobs)]
+        total = sum(Parallel(n_jobs=n_jobs)(delayed(_render_chunk)(kind, bloque) for bloque in bloques))
+    figuras_por_segundo = total / (time.perf_counter() - inicio)
+    print(f"{total} plots guardados ({figuras_por_segundo:.1f} figuras/s)")
+    return figuras_por_segundo
+
+def clustering(df, n_clusters=4, method='kmeans', eps_m=300, min_samples=5, min_cluster_size=5):
+    """
+    creando clusters y agregando la columna cluster al df
+        - 'kmeans': K-means sobre coordenadas proyectadas en metros
+        - 'dbscan': densidad con radio eps_m metros, distancia haversine y BallTree
+        - 'hdbscan': densidad sin radio fijo, distancia haversine y BallTree
+    en los metodos de densidad n_clusters no se usa y el ruido queda con cluster -1.
+    min_samples: vecinos para que un punto sea nucleo (dbscan y hdbscan);
+    min_cluster_size: estaciones minimas por cluster (solo hdbscan)
     """
     print("Calculando clusters...")
-    X = df[['latitud', 'longitud']]
-    kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-    clusters = kmeans.fit_predict(X)
+    if method == 'kmeans':
+        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
+        clusters = kmeans.fit_predict(to_meters(df))
+    elif method in ('dbscan', 'hdbscan'):
+        # haversine en sklearn espera [lat, lon] en radianes
+        X = np.radians(df[['latitud', 'longitud']].to_numpy(dtype=float))
+        if method == 'dbscan':
+            modelo = DBSCAN(eps=eps_m / RADIO_TIERRA_M, min_samples=min_samples,
+                            metric='haversine', algorithm='ball_tree')
+        else:
+            # X es una copia nueva: HDBSCAN puede trabajar sobre ella sin copiarla
+            modelo = HDBSCAN(min_cluster_size=min_cluster_size, min_samples=min_samples,
+                             metric='haversine', algorithm='ball_tree', copy=False)
+        clusters = modelo.fit_predict(X)
+        print(f"{len(set(clusters) - {-1})} clusters, {np.sum(clusters == -1)} estaciones como ruido")
+    else:
+        raise ValueError(f"Metodo de clustering desconocido: {method}")
     df['Cluster'] = clusters
     return df
 
-def create_map(df, filename="plots/mapa_final.html"):
+def update_clusters(df, model=None, new_rows=None, n_clusters=4):
+    """
+    clustering incremental para feeds en vivo con MiniBatchKMeans en metros:
+        - sin model: ajusta un modelo nuevo con todo df
+        - con model: solo hace partial_fit con new_rows (las estaciones nuevas o
+          que cambiaron; por defecto df) y no vuelve a ajustar todo
+    en ambos casos reasigna la columna cluster de todo df.
+    regresa (df, model) para pasar el modelo a la siguiente actualizacion
+    """
+    if model is None:
+        model = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=1024)
+        model.fit(to_meters(df))
+    else:
+        model.partial_fit(to_meters(df if new_rows is None else new_rows))
+    df['Cluster'] = model.predict(to_meters(df))
+    return df, model
+
+# colores por cluster, compartidos por el mapa normal y el rapido
+COLORES_CLUSTER = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'beige']
+
+# el popup se arma en el navegador con los campos de cada fila:
+# [lat, lon, color, id, calle, colonia, cluster]
+CALLBACK_ESTACION = """
+var callback = function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+        radius: 5, color: row[2], fill: true, fillColor: row[2], fillOpacity: 0.7
+    });
+    marker.bindPopup("<b>ID:</b> " + row[3] + "<br><b>Calle:</b> " + row[4] +
+                     "<br><b>Colonia:</b> " + row[5] + "<br><b>Cluster:</b> " + row[6]);
+    marker.bindTooltip(row[4] + " (" + row[5] + ")");
+    return marker;
+};
+"""
+
+def create_map(df, filename="plots/mapa_final.html", fast=False):
     """
     Genrando mapa interactivo con Folium
-    con circules y distintos colores por cluster
+    con circules y distintos colores por cluster.
+    con fast=True todas las estaciones van en una sola capa FastMarkerCluster
     """
     print("Generando mapa interactivo...")
 
     centro = [df['latitud'].mean(), df['longitud'].mean()]
     m = folium.Map(location=centro, zoom_start=13, tiles='CartoDB positron')
 
-    colores = ['red', 'blue', 'green', 'purple', 'orange', 'darkred', 'beige']
+    colores = COLORES_CLUSTER
+
+    if fast:
+        add_fast_layer(df, m)
+        m.save(filename)
+        print(f"Mapa interactivo guarado en {filename}")
+        return
 
     # Iterar osbre cada estacin para poner el punto
     for _, row in df.iterrows():
@@ -119,6 +446,28 @@ def create_map(df, filename="plots/mapa_final.html"):
     m.save(filename)
     print(f"Mapa interactivo guarado en {filename}")
 
+def add_fast_layer(df, m):
+    """
+    agregando todas las estaciones al mapa como una sola capa FastMarkerCluster.
+    las columnas se preparan completas con pandas/numpy (sin iterrows) y el
+    navegador crea los marcadores y popups con CALLBACK_ESTACION
+    """
+    cluster_ids = df['Cluster'].to_numpy().astype(int)
+    colores = np.array(COLORES_CLUSTER)[cluster_ids % len(COLORES_CLUSTER)]
+    # las coordenadas son float32: se suben a float64 antes de redondear para que
+    # el json lleve 19.454792 y no el ruido de float32 (19.454792022705078)
+    datos = list(zip(
+        df['latitud'].astype('float64').round(6).tolist(),
+        df['longitud'].astype('float64').round(6).tolist(),
+        colores.tolist(),
+        df['num_cicloe'].astype(str).tolist(),
+        df['calle_prin'].astype(str).tolist(),
+        df['colonia'].astype(str).tolist(),
+        cluster_ids.tolist()
+    ))
+    FastMarkerCluster(datos, callback=CALLBACK_ESTACION).add_to(m)
+    return m
+
 
 if __name__ == "__main__":
     df = loading_data("data/cicloestaciones_ecobici.csv")
@@ -0,0 +1,187 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from activity1 import create_map, best_k, clustering, update_clusters, loading_data, exploratory_plot, batch_plots, to_meters
+
+
+def generar_estaciones(n, n_clusters=4, semilla=42):
+    """
+    generando n estaciones sinteticas dentro de CDMX con las columnas que usa el pipeline
+    """
+    rng = np.random.default_rng(semilla)
+    return pd.DataFrame({
+        'latitud': rng.uniform(19.30, 19.50, n),
+        'longitud': rng.uniform(-99.25, -99.05, n),
+        'num_cicloe': [f"{i:05d}" for i in range(n)],
+        'calle_prin': rng.choice(["Reforma", "Insurgentes", "Juarez", "Patriotismo"], n),
+        'colonia': rng.choice(["Roma Norte", "Condesa", "Juarez", "Del Valle"], n),
+        'Cluster': rng.integers(0, n_clusters, n),
+    })
+
+def benchmark_create_map(tamanios=(1_000, 10_000, 100_000)):
+    """
+    comparando tiempo de generacion y tamaño del HTML entre el mapa con un
+    CircleMarker por estacion y la capa FastMarkerCluster (fast=True)
+    """
+    print("Benchmark create_map: CircleMarker por estacion vs FastMarkerCluster")
+    print(f"{'puntos':>8} | {'modo':>8} | {'tiempo (s)':>10} | {'HTML (MB)':>9}")
+    with tempfile.TemporaryDirectory() as temporal:
+        for n in tamanios:
+            df = generar_estaciones(n)
+            for fast in (False, True):
+                archivo = os.path.join(temporal, f"mapa_{n}_{fast}.html")
+                inicio = time.perf_counter()
+                create_map(df, filename=archivo, fast=fast)
+                segundos = time.perf_counter() - inicio
+                modo = "rapido" if fast else "normal"
+                print(f"{n:>8} | {modo:>8} | {segundos:>10.2f} | {os.path.getsize(archivo) / 1e6:>9.2f}")
+
+def generar_viajes(n, n_centros=6, semilla=42):
+    """
+    generando n origenes de viaje agrupados alrededor de n_centros zonas de CDMX
+    """
+    rng = np.random.default_rng(semilla)
+    centros = np.column_stack([rng.uniform(19.30, 19.50, n_centros), rng.uniform(-99.25, -99.05, n_centros)])
+    zona = rng.integers(0, n_centros, n)
+    puntos = centros[zona] + rng.normal(0, 0.01, (n, 2))
+    return pd.DataFrame({'latitud': puntos[:, 0], 'longitud': puntos[:, 1]})
+
+def best_k_secuencial(df):
+    """
+    referencia: el barrido original, un KMeans con n_init=10 tras otro (en metros, como best_k)
+    """
+    X = to_meters(df)
+    return [KMeans(n_clusters=k, random_state=42, n_init=10).fit(X).inertia_ for k in range(1, 11)]
+
+def benchmark_best_k(tamanios=(20_000, 200_000)):
+    """
+    comparando tiempo e inercia del barrido de k: secuencial, paralelo, warm start y mini batch
+    """
+    print("Benchmark best_k")
+    with tempfile.TemporaryDirectory() as temporal:
+        archivo = os.path.join(temporal, "codo.png")
+        for n in tamanios:
+            df = generar_viajes(n)
+            inicio = time.perf_counter()
+            referencia = np.array(best_k_secuencial(df))
+            t_referencia = time.perf_counter() - inicio
+            print(f"  {n} puntos | secuencial: {t_referencia:.2f}s")
+
+            modos = {
+                'paralelo': dict(mini_batch=False),
+                'warm start': dict(mini_batch=False, warm_start=True),
+                'mini batch': dict(mini_batch=True),
+                'mini batch + warm start': dict(mini_batch=True, warm_start=True),
+            }
+            for nombre, opciones in modos.items():
+                inicio = time.perf_counter()
+                resultados = best_k(df, filename=archivo, **opciones)
+                segundos = time.perf_counter() - inicio
+                # diferencia relativa maxima contra la curva de inercia original
+                diferencia = np.max(np.abs(resultados['inercia'].to_numpy() - referencia) / referencia)
+                print(f"  {n} puntos | {nombre}: {segundos:.2f}s ({t_referencia / segundos:.1f}x) | "
+                      f"diferencia de inercia max {diferencia:.2%}")
+
+def benchmark_clustering(tamanios=(10_000, 100_000), n_actualizaciones=5, nuevas=200):
+    """
+    comparando el refit completo (KMeans n_init=10) contra las actualizaciones
+    incrementales de update_clusters y los metodos de densidad con BallTree
+    """
+    print("Benchmark clustering")
+    for n in tamanios:
+        df = generar_viajes(n + n_actualizaciones * nuevas)
+        base = df.iloc[:n].copy()
+
+        inicio = time.perf_counter()
+        clustering(base.copy(), 6)
+        t_refit = time.perf_counter() - inicio
+        print(f"  {n} estaciones | refit completo: {t_refit:.2f}s")
+
+        base, modelo = update_clusters(base, n_clusters=6)
+        inicio = time.perf_counter()
+        for i in range(n_actualizaciones):
+            inicio_nuevas = n + i * nuevas
+            nuevas_filas = df.iloc[inicio_nuevas:inicio_nuevas + nuevas]
+            base = pd.concat([base, nuevas_filas])
+            base, modelo = update_clusters(base, modelo, new_rows=nuevas_filas)
+        t_incremental = (time.perf_counter() - inicio) / n_actualizaciones
+        # que tanto se parecen los clusters incrementales a un refit completo en metros
+        completo = clustering(base.copy(), 6)['Cluster']
+        print(f"  {n} estaciones | actualizacion incremental (+{nuevas}): {t_incremental:.3f}s "
+              f"({t_refit / t_incremental:.0f}x) | ARI vs refit {adjusted_rand_score(completo, base['Cluster']):.3f}")
+
+        metodos = ('dbscan', 'hdbscan') if n <= 20_000 else ('dbscan',)
+        for metodo in metodos:
+            inicio = time.perf_counter()
+            clustering(df.iloc[:n].copy(), method=metodo, eps_m=300, min_samples=20, min_cluster_size=20)
+            print(f"  {n} estaciones | {metodo}: {time.perf_counter() - inicio:.2f}s")
+
+def escribir_csv_ecobici(archivo, n, semilla=42):
+    """
+    escribiendo un csv sintetico con las columnas del pipeline mas otras que no se usan
+    """
+    df = generar_estaciones(n, semilla=semilla).drop(columns='Cluster')
+    rng = np.random.default_rng(semilla)
+    df['alcaldia'] = rng.choice(["Cuauhtémoc", "Benito Juárez", "Miguel Hidalgo"], n)
+    df['sistema'] = "ECOBICI"
+    df['fecha_alta'] = "2020-01-01"
+    df['capacidad'] = rng.integers(10, 40, n)
+    df['referencia'] = [f"Entre calle {i} y calle {i + 1}" for i in range(n)]
+    df.to_csv(archivo, index=False, encoding='latin1')
+
+def benchmark_loading_data(tamanios=(100_000, 1_000_000)):
+    """
+    comparando tiempo y memoria del read_csv original contra loading_data con
+    cada engine y con la cache parquet
+    """
+    print("Benchmark loading_data")
+    print(f"{'filas':>8} | {'modo':>16} | {'tiempo (s)':>10} | {'memoria (MB)':>12}")
+    with tempfile.TemporaryDirectory() as temporal:
+        for n in tamanios:
+            archivo = os.path.join(temporal, f"ecobici_{n}.csv")
+            escribir_csv_ecobici(archivo, n)
+            modos = {
+                'original': lambda: pd.read_csv(archivo, encoding='latin1'),
+                'tipado (c)': lambda: loading_data(archivo, engine='c', cache=False),
+                'tipado (pyarrow)': lambda: loading_data(archivo, engine='pyarrow', cache=False),
+                'cache fria': lambda: loading_data(archivo),
+                'cache caliente': lambda: loading_data(archivo),
+            }
+            for nombre, cargar in modos.items():
+                inicio = time.perf_counter()
+                df = cargar()
+                segundos = time.perf_counter() - inicio
+                print(f"{n:>8} | {nombre:>16} | {segundos:>10.2f} | {df.memory_usage(deep=True).sum() / 1e6:>12.1f}")
+
+def benchmark_batch_plots(n_figuras=40, puntos=20_000):
+    """
+    figuras por segundo del mapa exploratorio: una figura nueva por plot
+    (exploratory_plot) contra batch_plots reutilizando la figura, en uno y varios procesos
+    """
+    print("Benchmark batch_plots")
+    # un reporte por "dia": mismas estaciones, distinta semilla
+    dfs = [generar_estaciones(puntos, semilla=i) for i in range(n_figuras)]
+    with tempfile.TemporaryDirectory() as temporal:
+        archivos = [os.path.join(temporal, f"exploratorio_{i}.png") for i in range(n_figuras)]
+        inicio = time.perf_counter()
+        for df, archivo in zip(dfs, archivos):
+            exploratory_plot(df, archivo)
+        print(f"  una figura por plot: {n_figuras / (time.perf_counter() - inicio):.1f} figuras/s")
+
+        for n_jobs in (1, -1):
+            print(f"  batch_plots n_jobs={n_jobs}: ", end="")
+            batch_plots(list(zip(dfs, archivos)), n_jobs=n_jobs)
+
+
+if __name__ == "__main__":
+    benchmark_loading_data()
+    benchmark_create_map()
+    benchmark_best_k()
+    benchmark_batch_plots()
+    benchmark_clustering()
@@ -1,3 +1,5 @@
+import numpy as np
+import pandas as pd
 import geopandas as gpd
 import matplotlib.pyplot as plt
 from shapely.ops import unary_union
@@ -5,16 +7,25 @@ import folium
 import matplotlib.patches as mpatches 
 import contextily as ctx 
 
-def cargar_datos(ruta_hospitales="../data/centros_salud_cdmx/Centros_de_salud.shp", ruta_unidades="../data/unidades_habitacionales_cdmx/Unidades_Habitacionales.shp"):
+from capas import AlmacenCapas
+from ingesta import cargar_capa
+from teselas import agregar_mapa_base
+
+RUTA_HOSPITALES = "../data/centros_salud_cdmx/Centros_de_salud.shp"
+RUTA_UNIDADES = "../data/unidades_habitacionales_cdmx/Unidades_Habitacionales.shp"
+
+def cargar_datos(ruta_hospitales=RUTA_HOSPITALES, ruta_unidades=RUTA_UNIDADES, bbox=None):
     """
     Carga los shapefiles. GeoPandas busca automáticamente los archivos
     auxiliares (.dbf, .shx) en la misma carpeta que se encuentra el shp.
+    la primera vez se convierten a GeoParquet y despues se lee ese (ingesta.cargar_capa);
+    con bbox (lon/lat) solo se carga esa zona
     """
     print("cargando archivos...")
     try:
-        # Leemos el archivo .shp
-        gdf_hosp = gpd.read_file(ruta_hospitales)
-        gdf_uni = gpd.read_file(ruta_unidades)
+        # Leemos el GeoParquet (o el .shp la primera vez)
+        gdf_hosp = cargar_capa(ruta_hospitales, bbox=bbox)
+        gdf_uni = cargar_capa(ruta_unidades, bbox=bbox)
         print(f"Hospitales cargados: {len(gdf_hosp)}")
         print(f"Unidades Habitacionales cargadas: {len(gdf_uni)}")
         return gdf_hosp, gdf_uni
@@ -36,15 +47,41 @@ def gestionar_proyecciones(gdf_points, gdf_polys):
     
     return gdf_points_utm, gdf_polys_utm
 
-def analisis_cobertura(gdf_hosp_utm, gdf_uni_utm, radio_km=1):
+def analisis_cobertura(gdf_hosp_utm, gdf_uni_utm, radio_km=1, metodo='indice', buffers=None):
     """
     Genera buffers y determina qué unidades habitacionales tocan esos buffers de radio de 1km.
+        - metodo='union': une todos los buffers en una sola mancha y prueba cada unidad contra ella
+        - metodo='indice': prueba cada unidad solo contra los buffers cercanos con el
+          indice espacial (STRtree) de los buffers. da exactamente las mismas banderas
+          que 'union' sin construir la mancha
+        - metodo='distancia': sin buffers, cubierta si la unidad esta a <= radio del centro
+          (circulo exacto; el buffer es un poligono, asi que puede diferir en unidades
+          que rozan el borde)
+    buffers: geometrias de buffer ya calculadas (AlmacenCapas.buffer) para no recalcularlas
     """
-    print(f"generando buffers de {radio_km} km...")
-    
-    # crear buffer(radio en metros)
     radio_metros = radio_km * 1000
-    gdf_hosp_utm['geometry'] = gdf_hosp_utm.geometry.buffer(radio_metros)
+
+    if metodo == 'distancia':
+        print(f"buscando unidades a menos de {radio_km} km...")
+        # pares (unidad, hospital) a distancia <= radio_metros
+        idx_uni, _ = gdf_hosp_utm.sindex.query(gdf_uni_utm.geometry, predicate='dwithin', distance=radio_metros)
+        gdf_uni_utm['cubierta'] = _marcar_cubiertas(len(gdf_uni_utm), idx_uni)
+        return gdf_uni_utm
+
+    if buffers is None:
+        print(f"generando buffers de {radio_km} km...")
+        # crear buffer(radio en metros)
+        gdf_hosp_utm['geometry'] = gdf_hosp_utm.geometry.buffer(radio_metros)
+    else:
+        gdf_hosp_utm['geometry'] = gpd.GeoSeries(buffers).values
+
+    if metodo == 'indice':
+        # el indice descarta por caja envolvente y solo evalua intersects con los buffers
+        # cercanos; una unidad que toca varios buffers se marca una sola vez
+        gdf_uni_utm['cubierta'] = cubiertas_por_indice(gdf_hosp_utm, gdf_uni_utm)
+        return gdf_uni_utm
+    if metodo != 'union':
+        raise ValueError(f"Metodo de cobertura desconocido: {metodo}")
     
     # unificar los buffers para crear una sola "Mancha de Cobertura"
     # Esto evita contar doble si una colonia está cerca de dos hospitales
@@ -57,6 +94,57 @@ def analisis_cobertura(gdf_hosp_utm, gdf_uni_utm, radio_km=1):
     
     return gdf_uni_utm
 
+def distancia_minima(gdf_hosp_utm, gdf_uni_utm, max_km=None):
+    """
+    distancia en metros de cada unidad a su centro de salud mas cercano usando el
+    indice espacial de los centros. con max_km las unidades mas lejanas quedan en inf
+    (la busqueda se corta ahi y es mas rapida)
+    """
+    max_distancia = None if max_km is None else max_km * 1000
+    indices, distancias = gdf_hosp_utm.sindex.nearest(
+        gdf_uni_utm.geometry, return_all=False, return_distance=True, max_distance=max_distancia
+    )
+    distancia = np.full(len(gdf_uni_utm), np.inf)
+    distancia[indices[0]] = distancias
+    return distancia
+
+def barrido_radios(gdf_hosp_utm, gdf_uni_utm, radios_km=(0.5, 1, 2, 5)):
+    """
+    Cobertura para varios radios en una sola pasada: se calcula una vez la distancia
+    de cada unidad al centro mas cercano y cada radio solo es un umbral sobre ella
+    (mismo criterio que metodo='distancia' de analisis_cobertura).
+    regresa la tabla de KPI por radio y gdf_uni_utm con la columna distancia_min_m
+    (distancia real al centro mas cercano, tambien para las unidades fuera de todos los radios)
+    """
+    print(f"calculando cobertura para radios {list(radios_km)} km...")
+    distancia = distancia_minima(gdf_hosp_utm, gdf_uni_utm)
+    gdf_uni_utm['distancia_min_m'] = distancia
+
+    total = len(gdf_uni_utm)
+    cubiertas = [int(np.sum(distancia <= radio * 1000)) for radio in radios_km]
+    kpis = pd.DataFrame({
+        'radio_km': list(radios_km),
+        'unidades_cubiertas': cubiertas,
+        'total_unidades': total,
+        'cobertura_pct': [100 * c / total if total else 0.0 for c in cubiertas],
+    })
+    return kpis, gdf_uni_utm
+
+def cubiertas_por_indice(gdf_buffers, gdf_uni_utm):
+    """
+    bandera por unidad: True si toca algun buffer, consultando el indice espacial de los buffers
+    """
+    idx_uni, _ = gdf_buffers.sindex.query(gdf_uni_utm.geometry, predicate='intersects')
+    return _marcar_cubiertas(len(gdf_uni_utm), idx_uni)
+
+def _marcar_cubiertas(n_unidades, idx_uni):
+    """
+    arreglo booleano con True en las unidades que aparecen en algun par del indice
+    """
+    cubierta = np.zeros(n_unidades, dtype=bool)
+    cubierta[idx_uni] = True
+    return cubierta
+
 def visualizar_resultados(gdf_uni_procesada, gdf_hospitales_original, filename='../plots/head_map.png'):
     """
     Genera el mapa de calor: Verde (Cubierto) vs Rojo (Desatendido)
@@ -92,20 +180,31 @@ def visualizar_resultados(gdf_uni_procesada, gdf_hospitales_original, filename='
 
 
 
-def visualizar_final_pro(gdf_uni_procesada, gdf_hospitales_original, radio_km=1, filename='../plots/mapa_final_contexto.png'):
+def visualizar_final_pro(gdf_uni_procesada, gdf_hospitales_original, radio_km=1, filename='../plots/mapa_final_contexto.png', capas=None):
+    """
+    con capas (AlmacenCapas con 'hospitales' y 'unidades') las capas en 3857 y los
+    buffers se toman del almacen en lugar de reproyectar y rebufferear aqui
+    """
     print("generando visualizacion con contexto geografico...")
     fig, ax = plt.subplots(figsize=(20, 20))
-    # para que el mapa de fondo coincida, los datos deben estar en 3857
-    # unidades habitacionales (reproyectar a 3857)
-    uni_web = gdf_uni_procesada.to_crs(epsg=3857)
-    # hospitales (reproyectar a 3857)
-    hosp_web = gdf_hospitales_original.to_crs(epsg=3857)
-    # Buffers calculamos en UTM para precision y luego reproyectamos
-    # Primero pasamos a UTM para medir 1000m reales
-    hosp_utm = gdf_hospitales_original.to_crs(epsg=32614) 
-    buffers_utm = hosp_utm.geometry.buffer(radio_km * 1000)
-    # Ahora pasamos esos círculos a Web Mercator para el mapa
-    buffers_web = buffers_utm.to_crs(epsg=3857)
+    if capas is not None:
+        # mismas filas que las unidades analizadas, solo se copia la bandera
+        uni_web = capas.proyectar('unidades', 3857).assign(cubierta=gdf_uni_procesada['cubierta'].to_numpy())
+        hosp_web = capas.proyectar('hospitales', 3857)
+        capas.buffer('hospitales', radio_km * 1000)
+        buffers_web = capas.proyectar(AlmacenCapas.nombre_buffer('hospitales', radio_km * 1000), 3857).geometry
+    else:
+        # para que el mapa de fondo coincida, los datos deben estar en 3857
+        # unidades habitacionales (reproyectar a 3857)
+        uni_web = gdf_uni_procesada.to_crs(epsg=3857)
+        # hospitales (reproyectar a 3857)
+        hosp_web = gdf_hospitales_original.to_crs(epsg=3857)
+        # Buffers calculamos en UTM para precision y luego reproyectamos
+        # Primero pasamos a UTM para medir 1000m reales
+        hosp_utm = gdf_hospitales_original.to_crs(epsg=32614) 
+        buffers_utm = hosp_utm.geometry.buffer(radio_km * 1000)
+        # Ahora pasamos esos círculos a Web Mercator para el mapa
+        buffers_web = buffers_utm.to_crs(epsg=3857)
 
     # CAPAS DEL MAPA (Orden importa: Abajo -> Arriba)
     # Capa A: Buffers Azules (Fondo de datos)
@@ -122,7 +221,8 @@ def visualizar_final_pro(gdf_uni_procesada, gdf_hospitales_original, radio_km=1,
 
     # Aquí agregamos el mapa de calles sutil al fondo.
     # source=ctx.providers.CartoDB.Positron es el estilo limpio (gris).
-    ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron, zoom=12) # Zoom 12 es bueno para CDMX
+    # se lee del cache local de teselas (precargar con teselas.py), sin red
+    agregar_mapa_base(ax, source=ctx.providers.CartoDB.Positron, zoom=12) # Zoom 12 es bueno para CDMX
 
     plt.title(f"Análisis de Cobertura Hospitalaria CDMX - Radio {radio_km}km", fontsize=24, fontweight='bold')
     plt.axis('off') # Quitamos los ejes de coordenadas que ensucian
@@ -152,10 +252,17 @@ def visualizar_final_pro(gdf_uni_procesada, gdf_hospitales_original, radio_km=1,
 if __name__ == "__main__":
 
     try:
-        hospitales, unidades = cargar_datos()
-        hosp_utm, uni_utm = gestionar_proyecciones(hospitales, unidades)
-        unidades_analizadas = analisis_cobertura(hosp_utm.copy(), uni_utm, radio_km=1)
-        visualizar_resultados(unidades_analizadas, hospitales)
-        visualizar_final_pro(unidades_analizadas, hospitales)
+        # cada proyeccion y buffer se calcula una vez y queda en GeoParquet para
+        # las siguientes ejecuciones (y para activity2_2)
+        capas = AlmacenCapas("../data/capas")
+        capas.leer('hospitales', RUTA_HOSPITALES)
+        capas.leer('unidades', RUTA_UNIDADES)
+        hosp_utm = capas.proyectar('hospitales', 32614)
+        uni_utm = capas.proyectar('unidades', 32614)
+        buffers = capas.buffer('hospitales', 1000)
+        unidades_analizadas = analisis_cobertura(hosp_utm.copy(), uni_utm.copy(), radio_km=1, buffers=buffers.geometry)
+        visualizar_resultados(unidades_analizadas, hosp_utm)
+        visualizar_final_pro(unidades_analizadas, hosp_utm, capas=capas)
+        capas.resumen()
     except Exception as e:
         print(f"Error en la ejecución: {e}")
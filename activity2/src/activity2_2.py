@@ -1,33 +1,70 @@
+import numpy as np
 import geopandas as gpd
+from shapely import STRtree
 import matplotlib.pyplot as plt
 import contextily as ctx
 from matplotlib.colors import ListedColormap
 import matplotlib.patches as mpatches
 
-def analisis_final_categorias(ruta_colonias, ruta_hospitales, output_map="../plots/mapa_categorias_final.png"):
-    gdf_colonias = gpd.read_file(ruta_colonias).to_crs(epsg=32614)
-    gdf_hosp = gpd.read_file(ruta_hospitales).to_crs(epsg=32614)
+from capas import AlmacenCapas
+from ingesta import cargar_capa
+from teselas import agregar_mapa_base
+
+CATEGORIAS_COBERTURA = ["0: Sin Cobertura", "1: Un Hospital o Centro de salud", "2+: Múltiples Centros"]
+
+def contar_puntos_en_poligonos(gdf_puntos, gdf_poligonos, tamanio_bloque=1_000_000):
+    """
+    cuantos puntos caen dentro de cada poligono (mismo criterio que sjoin con 'within').
+    por bloques de puntos: se arma un STRtree del bloque y se consulta con todos los
+    poligonos usando 'contains' (asi GEOS prepara cada poligono una vez, como hace sjoin
+    por dentro). la memoria depende del tamaño del bloque y no del total de puntos.
+    regresa un arreglo de enteros alineado con las filas de gdf_poligonos
+    """
+    return contar_geometrias(gdf_puntos.geometry.values, gdf_poligonos.geometry.values, tamanio_bloque)
+
+def contar_geometrias(puntos, poligonos, tamanio_bloque=1_000_000):
+    """
+    nucleo de contar_puntos_en_poligonos sobre arreglos de geometrias de shapely
+    """
+    conteo = np.zeros(len(poligonos), dtype=np.int64)
+    for inicio in range(0, len(puntos), tamanio_bloque):
+        arbol = STRtree(puntos[inicio:inicio + tamanio_bloque])
+        # pares (poligono, punto) donde el poligono contiene al punto
+        idx_poligonos, _ = arbol.query(poligonos, predicate='contains')
+        conteo += np.bincount(idx_poligonos, minlength=len(poligonos))
+    return conteo
+
+def clasificar_cobertura(num_hospitales):
+    """
+    categoria de cada colonia segun su numero de centros: 0, 1 o 2+
+    """
+    num_hospitales = np.asarray(num_hospitales)
+    return np.select([num_hospitales == 0, num_hospitales == 1], CATEGORIAS_COBERTURA[:2], default=CATEGORIAS_COBERTURA[2])
+
+def analisis_final_categorias(ruta_colonias, ruta_hospitales, output_map="../plots/mapa_categorias_final.png", capas=None):
+    """
+    con capas (AlmacenCapas) las colonias y hospitales en 32614 salen del almacen,
+    reutilizando las proyecciones que ya haya guardado activity2
+    """
+    # de las colonias solo se usa la clave UT y la geometria
+    if capas is not None:
+        capas.leer('colonias', ruta_colonias, columnas=['UT'])
+        capas.leer('hospitales', ruta_hospitales)
+        gdf_colonias = capas.proyectar('colonias', 32614)
+        gdf_hosp = capas.proyectar('hospitales', 32614)
+    else:
+        gdf_colonias = cargar_capa(ruta_colonias, columnas=['UT']).to_crs(epsg=32614)
+        gdf_hosp = cargar_capa(ruta_hospitales).to_crs(epsg=32614)
     
-    # columna de las colonias
-    columna_clave = 'UT'
-    join_espacial = gpd.sjoin(gdf_hosp, gdf_colonias, how="inner", predicate="within")
-    conteo = join_espacial.groupby(columna_clave).size().reset_index(name='num_hospitales')
-    gdf_final = gdf_colonias.merge(conteo, on=columna_clave, how='left')
-    gdf_final['num_hospitales'] = gdf_final['num_hospitales'].fillna(0)
+    # numero de centros dentro de cada colonia
+    gdf_final = gdf_colonias.copy()
+    gdf_final['num_hospitales'] = contar_puntos_en_poligonos(gdf_hosp, gdf_colonias)
 
     # creacion de categorias    
-    def clasificar(n):
-        if n == 0:
-            return "0: Sin Cobertura"
-        elif n == 1:
-            return "1: Un Hospital o Centro de salud"
-        else:
-            return "2+: Múltiples Centros"
-    
-    gdf_final['categoria'] = gdf_final['num_hospitales'].apply(clasificar)
+    gdf_final['categoria'] = clasificar_cobertura(gdf_final['num_hospitales'])
     
     # ordenamos las categorías (0, 1, 2)
-    gdf_final = gdf_final.sort_values('num_hospitales')
+    gdf_final = gdf_final.sort_values('num_hospitales', kind='stable')
 
     # visualizacion de categorias
     gdf_web = gdf_final.to_crs(epsg=3857)
@@ -37,7 +74,7 @@ def analisis_final_categorias(ruta_colonias, ruta_hospitales, output_map="../plo
     # gris transparente para los vacíos, Azul para 1, Rojo para 2+
     colores = {
         "0: Sin Cobertura": "#bdc3c7",      # Gris (Silver)
-        "1: Un Centro": "#f39c12",          # Naranja
+        "1: Un Hospital o Centro de salud": "#f39c12",          # Naranja
         "2+: Múltiples Centros": "#c0392b"  # Rojo Oscuro
     }
     
@@ -55,8 +92,8 @@ def analisis_final_categorias(ruta_colonias, ruta_hospitales, output_map="../plo
                  legend=True,
                  legend_kwds={'loc': 'lower right', 'title': 'Nivel de Cobertura'})
 
-    # Mapa Base
-    ctx.add_basemap(ax, source=ctx.providers.CartoDB.Positron)
+    # Mapa Base (cache local de teselas, precargar con teselas.py)
+    agregar_mapa_base(ax, source=ctx.providers.CartoDB.Positron)
 
     plt.title("Clasificación de Cobertura Hospitalaria por Colonia", fontsize=22, fontweight='bold')
     plt.axis('off')
@@ -69,6 +106,6 @@ if __name__ == "__main__":
     ruta_shp_hosp = "../data/centros_salud_cdmx/Centros_de_salud.shp"
     
     try:
-        analisis_final_categorias(ruta_shp_iecm, ruta_shp_hosp)
+        analisis_final_categorias(ruta_shp_iecm, ruta_shp_hosp, capas=AlmacenCapas("../data/capas"))
     except Exception as e:
         print(f"Error: {e}")
\ No newline at end of file
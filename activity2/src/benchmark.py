@@ -0,0 +1,296 @@
+import os
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import geopandas as gpd
+import pandas as pd
+import shapely
+from shapely import box, points
+
+from activity2 import analisis_cobertura, barrido_radios, RUTA_HOSPITALES, RUTA_UNIDADES
+from capas import AlmacenCapas
+from ingesta import cargar_capa, reportar_tiempos_carga
+import teselas
+from activity2_2 import contar_puntos_en_poligonos, clasificar_cobertura
+from particion import cobertura_por_celdas, conteo_por_celdas
+
+# caja aproximada de CDMX en UTM 14N (metros)
+CAJA_CDMX_UTM = (470_000, 2_125_000, 500_000, 2_160_000)
+
+
+def caja_escalada(n, n_base=10_000, caja=CAJA_CDMX_UTM):
+    """
+    caja con area proporcional a n (densidad constante): n_base unidades caben en
+    la caja de CDMX y con mas unidades la zona crece como pasaria a escala nacional
+    """
+    factor = max(n / n_base, 1) ** 0.5
+    return (caja[0], caja[1], caja[0] + (caja[2] - caja[0]) * factor, caja[1] + (caja[3] - caja[1]) * factor)
+
+
+def generar_hospitales(n, semilla=42, caja=CAJA_CDMX_UTM):
+    """
+    generando n centros de salud (puntos) dentro de la caja, en EPSG:32614
+    """
+    rng = np.random.default_rng(semilla)
+    x = rng.uniform(caja[0], caja[2], n)
+    y = rng.uniform(caja[1], caja[3], n)
+    return gpd.GeoDataFrame({'id_hosp': np.arange(n)}, geometry=points(x, y), crs=32614)
+
+def generar_unidades(n, semilla=43, caja=CAJA_CDMX_UTM):
+    """
+    generando n unidades habitacionales (rectangulos de 40 a 250 m) dentro de la caja, en EPSG:32614
+    """
+    rng = np.random.default_rng(semilla)
+    x = rng.uniform(caja[0], caja[2], n)
+    y = rng.uniform(caja[1], caja[3], n)
+    ancho = rng.uniform(40, 250, n)
+    alto = rng.uniform(40, 250, n)
+    return gpd.GeoDataFrame({'id_unidad': np.arange(n)}, geometry=box(x, y, x + ancho, y + alto), crs=32614)
+
+def benchmark_cobertura(tamanios=(10_000, 100_000, 500_000), radio_km=1):
+    """
+    comparando la mancha unica (unary_union) contra el indice espacial y la distancia
+    directa, con un centro de salud por cada 200 unidades y la zona creciendo con n
+    """
+    print("Benchmark analisis_cobertura")
+    print(f"{'unidades':>9} | {'metodo':>9} | {'tiempo (s)':>10} | {'diferencias vs union':>20}")
+    for n in tamanios:
+        caja = caja_escalada(n)
+        hospitales = generar_hospitales(max(n // 200, 1), caja=caja)
+        unidades = generar_unidades(n, caja=caja)
+        referencia = None
+        for metodo in ('union', 'indice', 'distancia'):
+            inicio = time.perf_counter()
+            resultado = analisis_cobertura(hospitales.copy(), unidades.copy(), radio_km=radio_km, metodo=metodo)
+            segundos = time.perf_counter() - inicio
+            cubierta = resultado['cubierta'].to_numpy()
+            if referencia is None:
+                referencia = cubierta
+            print(f"{n:>9} | {metodo:>9} | {segundos:>10.2f} | {np.sum(cubierta != referencia):>20}")
+
+def benchmark_barrido_radios(n=200_000, radios_km=(0.25, 0.5, 0.75, 1, 1.5, 2, 2.5, 3, 4, 5)):
+    """
+    comparando un analisis_cobertura por radio contra barrido_radios en una sola pasada
+    """
+    print("Benchmark barrido_radios")
+    caja = caja_escalada(n)
+    hospitales = generar_hospitales(max(n // 200, 1), caja=caja)
+    unidades = generar_unidades(n, caja=caja)
+
+    inicio = time.perf_counter()
+    por_radio = {
+        radio: analisis_cobertura(hospitales.copy(), unidades.copy(), radio_km=radio, metodo='distancia')['cubierta'].to_numpy()
+        for radio in radios_km
+    }
+    t_por_radio = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    kpis, resultado = barrido_radios(hospitales, unidades.copy(), radios_km)
+    t_barrido = time.perf_counter() - inicio
+
+    diferencias = sum(
+        int(np.sum((resultado['distancia_min_m'].to_numpy() <= radio * 1000) != cubierta))
+        for radio, cubierta in por_radio.items()
+    )
+    print(kpis.to_string(index=False))
+    print(f"  {n} unidades, {len(radios_km)} radios | uno por radio: {t_por_radio:.2f}s | "
+          f"barrido: {t_barrido:.2f}s ({t_por_radio / t_barrido:.1f}x) | diferencias: {diferencias}")
+
+def escribir_shapefiles(directorio, n):
+    """
+    escribiendo hospitales y unidades sinteticos como shapefiles en EPSG:4326 (como los originales)
+    """
+    caja = caja_escalada(n)
+    rutas = (os.path.join(directorio, "hospitales.shp"), os.path.join(directorio, "unidades.shp"))
+    generar_hospitales(max(n // 200, 1), caja=caja).to_crs(epsg=4326).to_file(rutas[0])
+    generar_unidades(n, caja=caja).to_crs(epsg=4326).to_file(rutas[1])
+    return rutas
+
+def benchmark_capas(n=100_000, radio_km=1):
+    """
+    tiempo de preparar todas las capas de activity2 (32614, buffers y 3857) sin almacen,
+    con el almacen en frio (calcula y guarda GeoParquet) y en caliente (solo lee)
+    """
+    print("Benchmark AlmacenCapas")
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta_hosp, ruta_uni = escribir_shapefiles(temporal, n)
+
+        # lo que hacia el pipeline: cada funcion reproyecta y rebufferea por su cuenta
+        inicio = time.perf_counter()
+        hosp, uni = gpd.read_file(ruta_hosp), gpd.read_file(ruta_uni)
+        hosp_utm, uni_utm = hosp.to_crs(epsg=32614), uni.to_crs(epsg=32614)
+        hosp_utm.geometry.buffer(radio_km * 1000)
+        uni_utm.to_crs(epsg=3857)
+        hosp.to_crs(epsg=3857)
+        hosp.to_crs(epsg=32614).geometry.buffer(radio_km * 1000).to_crs(epsg=3857)
+        gpd.read_file(ruta_hosp).to_crs(epsg=32614)
+        print(f"  {n} unidades | sin almacen: {time.perf_counter() - inicio:.2f}s")
+
+        for corrida in ("frio", "caliente"):
+            inicio = time.perf_counter()
+            capas = AlmacenCapas(os.path.join(temporal, "capas"))
+            capas.leer('hospitales', ruta_hosp)
+            capas.leer('unidades', ruta_uni)
+            capas.proyectar('hospitales', 32614)
+            capas.proyectar('unidades', 32614)
+            capas.buffer('hospitales', radio_km * 1000)
+            capas.proyectar('unidades', 3857)
+            capas.proyectar('hospitales', 3857)
+            capas.proyectar(AlmacenCapas.nombre_buffer('hospitales', radio_km * 1000), 3857)
+            capas.proyectar('hospitales', 32614)
+            print(f"  {n} unidades | almacen en {corrida}: {time.perf_counter() - inicio:.2f}s | ", end="")
+            capas.resumen()
+
+def benchmark_ingesta(n=300_000):
+    """
+    tiempos de carga de cada capa: gpd.read_file del shapefile contra cargar_capa
+    en frio (convierte a GeoParquet) y en caliente, completa y con columnas + bbox
+    """
+    print("Benchmark ingesta (cargar_capa)")
+    with tempfile.TemporaryDirectory() as temporal:
+        rutas = dict(zip(("hospitales", "unidades"), escribir_shapefiles(temporal, n)))
+        # cuarto suroeste de la zona en lon/lat
+        x0, y0, x1, y1 = gpd.read_file(rutas["hospitales"]).total_bounds
+        bbox = (x0, y0, (x0 + x1) / 2, (y0 + y1) / 2)
+        for nombre, ruta in rutas.items():
+            modos = {
+                'read_file (shp)': lambda: gpd.read_file(ruta),
+                'frio': lambda: cargar_capa(ruta),
+                'caliente': lambda: cargar_capa(ruta),
+                'caliente sin atributos': lambda: cargar_capa(ruta, columnas=[]),
+                'caliente + bbox': lambda: cargar_capa(ruta, columnas=[], bbox=bbox),
+            }
+            for modo, cargar in modos.items():
+                inicio = time.perf_counter()
+                gdf = cargar()
+                print(f"  {nombre:>10} | {modo:>22} | {len(gdf):>7} filas | {time.perf_counter() - inicio:.2f}s")
+        # conversion, frio y caliente de cada capa en un directorio aparte
+        reportar_tiempos_carga(rutas)
+    # las capas reales, si estan (activity2 ya no mide esto al arrancar)
+    reales = {'hospitales': RUTA_HOSPITALES, 'unidades': RUTA_UNIDADES}
+    if all(os.path.exists(ruta) for ruta in reales.values()):
+        reportar_tiempos_carga(reales)
+
+def escribir_teselas_sinteticas(directorio, zoom, bbox=teselas.BBOX_CDMX):
+    """
+    llenando el cache local con teselas lisas (sin red) para medir el armado del mosaico
+    """
+    import mercantile
+    from PIL import Image
+    for tesela in mercantile.tiles(*bbox, zooms=[zoom]):
+        ruta = teselas._ruta_tesela(directorio, teselas.FUENTE_DEFAULT, tesela.z, tesela.x, tesela.y)
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        Image.new("RGB", (teselas.TAMANIO_TESELA,) * 2, (230, 230, 230)).save(ruta)
+
+def benchmark_teselas(zoom=13):
+    """
+    tiempo de armar el mapa base de CDMX desde el cache local: primera vez (une las
+    teselas), otra ejecucion (lee el .npz del mosaico) y otra figura en la misma ejecucion
+    """
+    print("Benchmark teselas")
+    with tempfile.TemporaryDirectory() as temporal:
+        escribir_teselas_sinteticas(temporal, zoom)
+        extent = generar_hospitales(100).to_crs(epsg=3857).total_bounds[[0, 2, 1, 3]]
+        for caso in ("teselas sueltas", "mosaico en disco", "mosaico en memoria"):
+            if caso == "mosaico en disco":
+                teselas._MOSAICOS.clear()
+            inicio = time.perf_counter()
+            imagen, _ = teselas.mosaico(extent, zoom, directorio=temporal)
+            print(f"  zoom {zoom} ({imagen.shape[1]}x{imagen.shape[0]} px) | {caso}: {time.perf_counter() - inicio:.3f}s")
+
+def generar_colonias(n, semilla=44, caja=CAJA_CDMX_UTM):
+    """
+    generando n colonias (poligonos de voronoi recortados a la caja) con clave UT, en EPSG:32614
+    """
+    rng = np.random.default_rng(semilla)
+    semillas = points(rng.uniform(caja[0], caja[2], n), rng.uniform(caja[1], caja[3], n))
+    voronoi = shapely.voronoi_polygons(shapely.multipoints(semillas), extend_to=box(*caja))
+    poligonos = shapely.intersection(shapely.get_parts(voronoi), box(*caja))
+    return gpd.GeoDataFrame({'UT': [f"UT-{i:05d}" for i in range(len(poligonos))]}, geometry=poligonos, crs=32614)
+
+def conteo_sjoin(gdf_puntos, gdf_colonias):
+    """
+    referencia: el conteo original con sjoin + groupby + merge + apply
+    """
+    join_espacial = gpd.sjoin(gdf_puntos, gdf_colonias, how="inner", predicate="within")
+    conteo = join_espacial.groupby('UT').size().reset_index(name='num_hospitales')
+    gdf_final = gdf_colonias.merge(conteo, on='UT', how='left')
+    gdf_final['num_hospitales'] = gdf_final['num_hospitales'].fillna(0)
+    def clasificar(n):
+        if n == 0:
+            return "0: Sin Cobertura"
+        elif n == 1:
+            return "1: Un Hospital o Centro de salud"
+        else:
+            return "2+: Múltiples Centros"
+    gdf_final['categoria'] = gdf_final['num_hospitales'].apply(clasificar)
+    return gdf_final
+
+def benchmark_conteo_poligonos(tamanios=(10_000, 1_000_000, 5_000_000), n_colonias=5_000):
+    """
+    comparando el conteo original con contar_puntos_en_poligonos + clasificar_cobertura
+    (tiempo y pico de memoria) al crecer el numero de puntos
+    """
+    print("Benchmark conteo de puntos en colonias")
+    colonias = generar_colonias(n_colonias)
+    for n in tamanios:
+        puntos_gdf = generar_hospitales(n)
+        resultados = {}
+        for nombre, contar in (
+            ('sjoin', lambda: conteo_sjoin(puntos_gdf, colonias)),
+            ('vectorizado', lambda: pd.DataFrame({
+                'num_hospitales': contar_puntos_en_poligonos(puntos_gdf, colonias),
+            }).assign(categoria=lambda df: clasificar_cobertura(df['num_hospitales']))),
+        ):
+            tracemalloc.start()
+            inicio = time.perf_counter()
+            resultados[nombre] = contar()
+            segundos = time.perf_counter() - inicio
+            pico = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"  {n:>9} puntos | {nombre:>11}: {segundos:.2f}s | pico {pico / 1e6:.0f} MB")
+        iguales = (np.array_equal(resultados['sjoin']['num_hospitales'].to_numpy(), resultados['vectorizado']['num_hospitales'].to_numpy())
+                   and np.array_equal(resultados['sjoin']['categoria'].to_numpy(), resultados['vectorizado']['categoria'].to_numpy()))
+        print(f"  {n:>9} puntos | mismos conteos y categorias: {iguales}")
+
+def benchmark_particion(n=1_000_000, procesos=(1, 2, 4), tamanio_celda_km=20):
+    """
+    escalamiento de la cobertura y del conteo por celdas de 1 a N procesos, comparando
+    contra la corrida de un solo proceso sin celdas (las salidas deben ser identicas)
+    """
+    print(f"Benchmark particion por celdas ({os.cpu_count()} nucleos disponibles)")
+    caja = caja_escalada(n)
+    hospitales = generar_hospitales(max(n // 200, 1), caja=caja)
+    unidades = generar_unidades(n, caja=caja)
+    colonias = generar_colonias(max(n // 100, 1), caja=caja)
+
+    inicio = time.perf_counter()
+    referencia = analisis_cobertura(hospitales.copy(), unidades.copy(), metodo='indice')['cubierta'].to_numpy()
+    print(f"  cobertura sin celdas: {time.perf_counter() - inicio:.2f}s")
+    for n_procesos in procesos:
+        inicio = time.perf_counter()
+        cubierta = cobertura_por_celdas(hospitales, unidades.copy(), tamanio_celda_km=tamanio_celda_km,
+                                        procesos=n_procesos)['cubierta'].to_numpy()
+        print(f"  cobertura {n_procesos} procesos: {time.perf_counter() - inicio:.2f}s | "
+              f"identica: {np.array_equal(cubierta, referencia)}")
+
+    puntos_negocios = generar_hospitales(n * 5, caja=caja)
+    inicio = time.perf_counter()
+    referencia = contar_puntos_en_poligonos(puntos_negocios, colonias)
+    print(f"  conteo sin celdas: {time.perf_counter() - inicio:.2f}s")
+    for n_procesos in procesos:
+        inicio = time.perf_counter()
+        conteo = conteo_por_celdas(puntos_negocios, colonias, tamanio_celda_km=tamanio_celda_km, procesos=n_procesos)
+        print(f"  conteo {n_procesos} procesos: {time.perf_counter() - inicio:.2f}s | "
+              f"identico: {np.array_equal(conteo, referencia)}")
+
+
+if __name__ == "__main__":
+    benchmark_ingesta()
+    benchmark_cobertura()
+    benchmark_barrido_radios()
+    benchmark_capas()
+    benchmark_teselas()
+    benchmark_conteo_poligonos()
+    benchmark_particion()
@@ -0,0 +1,127 @@
+import os
+import hashlib
+import geopandas as gpd
+
+from ingesta import huella_archivo, cargar_capa, borrar_versiones_anteriores
+
+
+class AlmacenCapas:
+    """
+    almacen de capas compartido por activity2 y activity2_2. cada capa se registra
+    una vez y sus transformaciones se memorizan:
+        - proyectar(nombre, epsg): to_crs una sola vez por (capa, crs)
+        - buffer(nombre, radio_m): buffer una sola vez por (capa, radio), en metros
+    si la capa tiene huella (viene de un archivo) y se da un directorio, las capas
+    proyectadas y los buffers se guardan en GeoParquet y las siguientes ejecuciones
+    los leen de ahi. las capas que regresa son compartidas: no se deben modificar
+    en su lugar (usar .copy())
+    """
+    def __init__(self, directorio=None):
+        self.directorio = directorio
+        self.capas = {}
+        self.rutas = {}
+        self.huellas = {}
+        self.memoria = {}
+        self.calculadas = 0
+        self.reutilizadas = 0
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+    def _olvidar(self, nombre):
+        # una capa re-registrada invalida lo que se habia calculado con ella
+        es_derivada = lambda n: n == nombre or n.startswith(f"{nombre}_buffer_")
+        self.memoria = {llave: capa for llave, capa in self.memoria.items() if not es_derivada(llave[0])}
+        for derivada in [n for n in self.capas if es_derivada(n)]:
+            del self.capas[derivada]
+        self.rutas.pop(nombre, None)
+
+    def registrar(self, nombre, gdf, huella=None):
+        """
+        agregando una capa en su crs original. sin huella solo se memoriza en memoria
+        """
+        self._olvidar(nombre)
+        self.capas[nombre] = gdf
+        self.huellas[nombre] = huella
+        return gdf
+
+    def leer(self, nombre, ruta, columnas=None, bbox=None):
+        """
+        registrando un archivo (shp, gpkg...) con su huella. el archivo no se lee
+        hasta que se necesita: si sus proyecciones ya estan en GeoParquet nunca se abre.
+        columnas y bbox se pasan a cargar_capa y forman parte de la huella
+        """
+        self._olvidar(nombre)
+        self.rutas[nombre] = (ruta, columnas, bbox)
+        huella = f"{huella_archivo(ruta)}:{columnas}:{bbox}"
+        self.huellas[nombre] = hashlib.sha256(huella.encode()).hexdigest()
+
+    def capa(self, nombre):
+        """
+        la capa en su crs original (leyendola por el camino rapido de ingesta si hace falta)
+        """
+        if nombre not in self.capas:
+            ruta, columnas, bbox = self.rutas[nombre]
+            print(f"leyendo {ruta}...")
+            self.capas[nombre] = cargar_capa(ruta, columnas=columnas, bbox=bbox)
+        return self.capas[nombre]
+
+    def _archivo(self, nombre, operacion):
+        if not self.directorio or self.huellas.get(nombre) is None:
+            return None
+        return os.path.join(self.directorio, f"{nombre}_{operacion}_{self.huellas[nombre][:12]}.parquet")
+
+    def _memorizar(self, llave, archivo, calcular):
+        """
+        regresando la capa de memoria, del GeoParquet o calculandola (en ese orden)
+        """
+        if llave in self.memoria:
+            self.reutilizadas += 1
+            return self.memoria[llave]
+        if archivo and os.path.exists(archivo):
+            self.reutilizadas += 1
+            capa = gpd.read_parquet(archivo)
+        else:
+            self.calculadas += 1
+            capa = calcular()
+            if archivo:
+                capa.to_parquet(archivo + ".tmp")
+                os.replace(archivo + ".tmp", archivo)
+                borrar_versiones_anteriores(archivo)
+        self.memoria[llave] = capa
+        return capa
+
+    def proyectar(self, nombre, epsg):
+        """
+        la capa nombre en EPSG:epsg, reproyectando solo la primera vez
+        """
+        capa = self.capas.get(nombre)
+        if capa is not None and capa.crs is not None and capa.crs.to_epsg() == epsg:
+            return capa
+        return self._memorizar((nombre, epsg), self._archivo(nombre, f"epsg{epsg}"),
+                               lambda: self.capa(nombre).to_crs(epsg=epsg))
+
+    @staticmethod
+    def nombre_buffer(nombre, radio_m):
+        return f"{nombre}_buffer_{radio_m}m"
+
+    def buffer(self, nombre, radio_m, epsg=32614):
+        """
+        buffers de radio_m metros de la capa nombre (calculados en EPSG:epsg, que debe
+        estar en metros). el resultado se registra como la capa nombre_buffer(nombre, radio_m)
+        para poder proyectarlo tambien
+        """
+        nombre_buffer = self.nombre_buffer(nombre, radio_m)
+        if nombre_buffer not in self.capas:
+            def calcular():
+                proyectada = self.proyectar(nombre, epsg)
+                return proyectada.set_geometry(proyectada.geometry.buffer(radio_m))
+            capa = self._memorizar((nombre, f"buffer{radio_m}"), self._archivo(nombre, f"epsg{epsg}_buffer{radio_m}m"), calcular)
+            huella = None
+            if self.huellas.get(nombre) is not None:
+                huella = hashlib.sha256(f"{self.huellas[nombre]}:{epsg}:{radio_m}".encode()).hexdigest()
+            self.capas[nombre_buffer] = capa
+            self.huellas[nombre_buffer] = huella
+        return self.capas[nombre_buffer]
+
+    def resumen(self):
+        print(f"Capas: {self.calculadas} transformaciones calculadas, {self.reutilizadas} reutilizadas")
@@ -0,0 +1,104 @@
+import os
+import re
+import time
+import hashlib
+import tempfile
+import geopandas as gpd
+
+
+def huella_archivo(ruta):
+    """
+    huella barata de un shapefile (o cualquier archivo): nombre, tamaño y fecha de
+    modificacion del archivo y de sus auxiliares (.dbf, .shx, .prj...) con el mismo nombre
+    """
+    base = os.path.splitext(ruta)[0]
+    directorio = os.path.dirname(ruta) or "."
+    huella = hashlib.sha256()
+    for nombre in sorted(os.listdir(directorio)):
+        completo = os.path.join(directorio, nombre)
+        if os.path.splitext(completo)[0] == base:
+            estado = os.stat(completo)
+            huella.update(f"{nombre}:{estado.st_size}:{estado.st_mtime_ns}".encode())
+    return huella.hexdigest()
+
+def ruta_geoparquet(ruta, directorio=None):
+    """
+    GeoParquet que corresponde a la version actual de ruta (por defecto en una
+    carpeta geoparquet junto al archivo fuente)
+    """
+    if directorio is None:
+        directorio = os.path.join(os.path.dirname(ruta), "geoparquet")
+    nombre = os.path.splitext(os.path.basename(ruta))[0]
+    return os.path.join(directorio, f"{nombre}_{huella_archivo(ruta)[:12]}.parquet")
+
+def borrar_versiones_anteriores(archivo):
+    """
+    borrando los .parquet junto a archivo con el mismo nombre y otra huella
+    (nombre_<huella de 12 hex>.parquet)
+    """
+    directorio = os.path.dirname(archivo) or "."
+    prefijo = os.path.basename(archivo)[:-len("0123456789ab.parquet")]
+    patron = re.compile(re.escape(prefijo) + r"[0-9a-f]{12}\.parquet$")
+    for nombre in os.listdir(directorio):
+        if patron.match(nombre) and nombre != os.path.basename(archivo):
+            os.remove(os.path.join(directorio, nombre))
+
+def convertir_a_geoparquet(ruta, directorio=None):
+    """
+    convirtiendo un shapefile a GeoParquet una sola vez (lectura con pyogrio por Arrow).
+    se escribe la columna bbox para que las lecturas con bbox puedan saltarse filas
+    sin decodificar geometrias. regresa la ruta del GeoParquet
+    """
+    destino = ruta_geoparquet(ruta, directorio)
+    if os.path.exists(destino):
+        return destino
+
+    print(f"convirtiendo {ruta} a GeoParquet...")
+    gdf = gpd.read_file(ruta, engine="pyogrio", use_arrow=True)
+    os.makedirs(os.path.dirname(destino), exist_ok=True)
+    gdf.to_parquet(destino + ".tmp", write_covering_bbox=True)
+    os.replace(destino + ".tmp", destino)
+    # borrando conversiones de versiones anteriores del mismo archivo
+    borrar_versiones_anteriores(destino)
+    return destino
+
+def cargar_capa(ruta, columnas=None, bbox=None, directorio=None, convertir=True):
+    """
+    Cargando una capa por el camino rapido:
+        - si existe (o se puede crear, con convertir=True) su GeoParquet se lee con read_parquet
+        - si no, se lee la fuente con pyogrio por Arrow
+    columnas: atributos a leer (la geometria siempre va); None = todos
+    bbox: (minx, miny, maxx, maxy) en el crs de la capa; solo se leen las geometrias que la tocan
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+    if convertir:
+        convertir_a_geoparquet(ruta, directorio)
+    destino = ruta_geoparquet(ruta, directorio)
+    if os.path.exists(destino):
+        return gpd.read_parquet(destino, columns=None if columnas is None else [*columnas, "geometry"], bbox=bbox)
+    return gpd.read_file(ruta, engine="pyogrio", use_arrow=True, columns=columnas, bbox=bbox)
+
+def reportar_tiempos_carga(rutas, columnas=None, bbox=None):
+    """
+    tiempos de carga de cada capa. rutas: {nombre: ruta}
+        - conversion: shapefile -> GeoParquet
+        - frio: cargar_capa sin GeoParquet previo (conversion + lectura)
+        - caliente: cargar_capa con el GeoParquet ya escrito
+    las conversiones se hacen en un directorio temporal, asi el frio es frio aunque
+    ya exista el GeoParquet del archivo y no se toca la cache real
+    """
+    for nombre, ruta in rutas.items():
+        columnas_capa = (columnas or {}).get(nombre)
+        with tempfile.TemporaryDirectory() as temporal:
+            inicio = time.perf_counter()
+            convertir_a_geoparquet(ruta, os.path.join(temporal, "conversion"))
+            t_conversion = time.perf_counter() - inicio
+
+            tiempos = []
+            for _ in ("frio", "caliente"):
+                inicio = time.perf_counter()
+                gdf = cargar_capa(ruta, columnas=columnas_capa, bbox=bbox, directorio=os.path.join(temporal, "carga"))
+                tiempos.append(time.perf_counter() - inicio)
+        print(f"{nombre}: {len(gdf)} filas | conversion {t_conversion:.2f}s | "
+              f"frio {tiempos[0]:.2f}s | caliente {tiempos[1]:.2f}s")
@@ -0,0 +1,114 @@
+import os
+import numpy as np
+import multiprocessing as mp
+import pandas as pd
+import shapely
+from shapely import box, STRtree
+from concurrent.futures import ProcessPoolExecutor
+
+from activity2 import _marcar_cubiertas
+from activity2_2 import contar_geometrias
+
+
+def asignar_celdas(gdf, tamanio_celda_m):
+    """
+    celda de la malla (tamanio_celda_m metros de lado) a la que pertenece cada fila,
+    por el centro de su caja envolvente. cada fila pertenece a una sola celda
+    """
+    limites = gdf.geometry.bounds.to_numpy()
+    centro_x = (limites[:, 0] + limites[:, 2]) / 2
+    centro_y = (limites[:, 1] + limites[:, 3]) / 2
+    columna = np.floor((centro_x - np.nanmin(centro_x)) / tamanio_celda_m).astype(np.int64)
+    fila = np.floor((centro_y - np.nanmin(centro_y)) / tamanio_celda_m).astype(np.int64)
+    return fila * (columna.max() + 1) + columna
+
+def _tareas_por_celda(gdf_duenos, gdf_vecinos, tamanio_celda_m, halo_m):
+    """
+    una tarea por celda ocupada: posiciones de las filas de gdf_duenos que le pertenecen
+    y de las filas de gdf_vecinos dentro de su caja mas el halo. las celdas van en
+    orden de id, asi el resultado no depende del orden en que terminen los procesos
+    """
+    celdas = asignar_celdas(gdf_duenos, tamanio_celda_m)
+    limites = gdf_duenos.geometry.bounds.to_numpy()
+    arbol_vecinos = gdf_vecinos.sindex
+    tareas = []
+    for _, posiciones in pd.Series(np.arange(len(gdf_duenos))).groupby(celdas, sort=True):
+        posiciones = posiciones.to_numpy()
+        # el halo se mide desde la caja de las filas de la celda (que pueden salirse de ella)
+        minx, miny = np.nanmin(limites[posiciones, :2], axis=0)
+        maxx, maxy = np.nanmax(limites[posiciones, 2:], axis=0)
+        vecinos = arbol_vecinos.query(box(minx - halo_m, miny - halo_m, maxx + halo_m, maxy + halo_m))
+        tareas.append((posiciones, np.sort(vecinos)))
+    return tareas
+
+# geometrias completas en cada proceso trabajador (arreglos de shapely, sin el costo
+# de crear GeoDataFrames por celda): las tareas solo llevan posiciones
+_CAPAS_TRABAJADOR = None
+
+def _iniciar_trabajador(capas):
+    global _CAPAS_TRABAJADOR
+    _CAPAS_TRABAJADOR = capas
+
+def _ejecutar(funcion, tareas, procesos, capas):
+    """
+    corriendo funcion sobre las tareas, en este proceso o en un pool. con fork los
+    trabajadores heredan las capas sin serializarlas; con spawn se copian una vez por trabajador
+    """
+    procesos = procesos or os.cpu_count()
+    if procesos == 1:
+        _iniciar_trabajador(capas)
+        return [funcion(tarea) for tarea in tareas]
+    contexto = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto,
+                             initializer=_iniciar_trabajador, initargs=(capas,)) as executor:
+        # map conserva el orden de las tareas
+        return list(executor.map(funcion, tareas, chunksize=max(1, len(tareas) // (4 * procesos))))
+
+def _cobertura_celda(tarea):
+    posiciones_uni, posiciones_hosp = tarea
+    geometrias_uni, geometrias_hosp, radio_km = _CAPAS_TRABAJADOR
+    # igual que analisis_cobertura(metodo='indice'): mismos buffers (quad_segs=16 es
+    # el default de GeoSeries.buffer) y mismo intersects contra su STRtree
+    buffers = shapely.buffer(geometrias_hosp[posiciones_hosp], radio_km * 1000, quad_segs=16)
+    idx_uni, _ = STRtree(buffers).query(geometrias_uni[posiciones_uni], predicate='intersects')
+    return _marcar_cubiertas(len(posiciones_uni), idx_uni)
+
+def cobertura_por_celdas(gdf_hosp_utm, gdf_uni_utm, radio_km=1, tamanio_celda_km=20, procesos=None):
+    """
+    analisis_cobertura repartido en celdas de tamanio_celda_km y ejecutado en un pool
+    de procesos (procesos=None usa todos los nucleos, 1 lo corre aqui mismo).
+    cada celda recibe sus unidades y los centros a menos de radio_km de ellas (el halo),
+    asi que cada unidad ve los mismos buffers que en la corrida de un solo proceso y
+    la columna cubierta sale identica a la de analisis_cobertura(metodo='indice')
+    """
+    print(f"cobertura por celdas de {tamanio_celda_km} km...")
+    tareas = _tareas_por_celda(gdf_uni_utm, gdf_hosp_utm, tamanio_celda_km * 1000, radio_km * 1000)
+    capas = (np.asarray(gdf_uni_utm.geometry.values), np.asarray(gdf_hosp_utm.geometry.values), radio_km)
+    resultados = _ejecutar(_cobertura_celda, tareas, procesos, capas)
+
+    cubierta = np.zeros(len(gdf_uni_utm), dtype=bool)
+    for (posiciones, _), resultado in zip(tareas, resultados):
+        cubierta[posiciones] = resultado
+    gdf_uni_utm['cubierta'] = cubierta
+    return gdf_uni_utm
+
+def _conteo_celda(tarea):
+    posiciones_poligonos, posiciones_puntos = tarea
+    geometrias_poligonos, geometrias_puntos = _CAPAS_TRABAJADOR
+    return contar_geometrias(geometrias_puntos[posiciones_puntos], geometrias_poligonos[posiciones_poligonos])
+
+def conteo_por_celdas(gdf_puntos, gdf_poligonos, tamanio_celda_km=20, procesos=None):
+    """
+    contar_puntos_en_poligonos repartido en celdas y ejecutado en un pool de procesos.
+    cada celda recibe sus poligonos y los puntos dentro de la caja de esos poligonos,
+    asi que cada conteo es el mismo que en un solo proceso
+    """
+    print(f"conteo por celdas de {tamanio_celda_km} km...")
+    tareas = _tareas_por_celda(gdf_poligonos, gdf_puntos, tamanio_celda_km * 1000, 0)
+    capas = (np.asarray(gdf_poligonos.geometry.values), np.asarray(gdf_puntos.geometry.values))
+    resultados = _ejecutar(_conteo_celda, tareas, procesos, capas)
+
+    conteo = np.zeros(len(gdf_poligonos), dtype=np.int64)
+    for (posiciones, _), resultado in zip(tareas, resultados):
+        conteo[posiciones] = resultado
+    return conteo
@@ -0,0 +1,136 @@
+import os
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import mercantile
+import requests
+import contextily as ctx
+from PIL import Image
+from pyproj import Transformer
+
+DIRECTORIO_TESELAS = "../data/teselas"
+FUENTE_DEFAULT = ctx.providers.CartoDB.Positron
+# caja de CDMX en lon/lat (oeste, sur, este, norte)
+BBOX_CDMX = (-99.37, 19.04, -98.93, 19.60)
+TAMANIO_TESELA = 256
+
+_A_LONLAT = Transformer.from_crs(3857, 4326, always_xy=True)
+# mosaicos ya armados en esta ejecucion: (fuente, zoom, x0, x1, y0, y1) -> (imagen, extent)
+_MOSAICOS = {}
+
+
+def _ruta_tesela(directorio, source, z, x, y):
+    return os.path.join(directorio, source.name, str(z), str(x), f"{y}.png")
+
+def precargar_teselas(bbox=BBOX_CDMX, zooms=range(10, 15), source=FUENTE_DEFAULT, directorio=DIRECTORIO_TESELAS, hilos=8):
+    """
+    Descargando al cache local todas las teselas de bbox (lon/lat) para los zooms dados.
+    es el unico paso que necesita red; las teselas que ya estan no se vuelven a bajar
+    """
+    faltantes = [
+        tesela for tesela in mercantile.tiles(*bbox, zooms=list(zooms))
+        if not os.path.exists(_ruta_tesela(directorio, source, tesela.z, tesela.x, tesela.y))
+    ]
+    print(f"descargando {len(faltantes)} teselas de {source.name}...")
+
+    sesion = requests.Session()
+    sesion.headers["User-Agent"] = "activity2-teselas"
+
+    def descargar(tesela):
+        ruta = _ruta_tesela(directorio, source, tesela.z, tesela.x, tesela.y)
+        respuesta = sesion.get(source.build_url(x=tesela.x, y=tesela.y, z=tesela.z), timeout=30)
+        respuesta.raise_for_status()
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta + ".tmp", "wb") as archivo:
+            archivo.write(respuesta.content)
+        os.replace(ruta + ".tmp", ruta)
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        list(pool.map(descargar, faltantes))
+    print("teselas listas !")
+
+def calcular_zoom(w, s, e, n):
+    """
+    mismo zoom automatico que contextily (bbox en lon/lat)
+    """
+    zoom_lon = np.ceil(np.log2(360 * 2.0 / abs(e - w)))
+    zoom_lat = np.ceil(np.log2(360 * 2.0 / abs(n - s)))
+    return int(min(zoom_lon, zoom_lat))
+
+def mosaico(extent, zoom, source=FUENTE_DEFAULT, directorio=DIRECTORIO_TESELAS):
+    """
+    uniendo las teselas locales que cubren extent (xmin, xmax, ymin, ymax en EPSG:3857).
+    solo lee del cache: si falta alguna tesela lanza FileNotFoundError con el comando
+    de precarga. el mosaico se guarda (memoria y .npz) y se reutiliza en otras figuras
+    con las mismas teselas. regresa (imagen, extent_del_mosaico)
+    """
+    xmin, xmax, ymin, ymax = extent
+    w, s = _A_LONLAT.transform(xmin, ymin)
+    e, n = _A_LONLAT.transform(xmax, ymax)
+    esquina_no = mercantile.tile(w, n, zoom)
+    esquina_se = mercantile.tile(e, s, zoom)
+    x0, x1, y0, y1 = esquina_no.x, esquina_se.x, esquina_no.y, esquina_se.y
+
+    llave = (source.name, zoom, x0, x1, y0, y1)
+    if llave in _MOSAICOS:
+        return _MOSAICOS[llave]
+
+    ruta_mosaico = os.path.join(directorio, source.name, "mosaicos", f"{zoom}_{x0}_{x1}_{y0}_{y1}.npz")
+    if os.path.exists(ruta_mosaico):
+        datos = np.load(ruta_mosaico)
+        _MOSAICOS[llave] = (datos["imagen"], tuple(datos["extent"]))
+        return _MOSAICOS[llave]
+
+    faltantes = [
+        (x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)
+        if not os.path.exists(_ruta_tesela(directorio, source, zoom, x, y))
+    ]
+    if faltantes:
+        raise FileNotFoundError(
+            f"Faltan {len(faltantes)} teselas de {source.name} en zoom {zoom} en {directorio}. "
+            f"Precargarlas con: python teselas.py --bbox {w:.4f} {s:.4f} {e:.4f} {n:.4f} --zooms {zoom}"
+        )
+
+    imagen = np.zeros(((y1 - y0 + 1) * TAMANIO_TESELA, (x1 - x0 + 1) * TAMANIO_TESELA, 4), dtype=np.uint8)
+    for x in range(x0, x1 + 1):
+        for y in range(y0, y1 + 1):
+            with Image.open(_ruta_tesela(directorio, source, zoom, x, y)) as tesela:
+                fila, columna = (y - y0) * TAMANIO_TESELA, (x - x0) * TAMANIO_TESELA
+                imagen[fila:fila + TAMANIO_TESELA, columna:columna + TAMANIO_TESELA] = np.asarray(tesela.convert("RGBA"))
+
+    izquierda = mercantile.xy_bounds(x0, y0, zoom)
+    derecha = mercantile.xy_bounds(x1, y1, zoom)
+    extent_mosaico = (izquierda.left, derecha.right, derecha.bottom, izquierda.top)
+
+    os.makedirs(os.path.dirname(ruta_mosaico), exist_ok=True)
+    np.savez(ruta_mosaico, imagen=imagen, extent=extent_mosaico)
+    _MOSAICOS[llave] = (imagen, extent_mosaico)
+    return _MOSAICOS[llave]
+
+def agregar_mapa_base(ax, zoom='auto', source=FUENTE_DEFAULT, directorio=DIRECTORIO_TESELAS):
+    """
+    reemplazo offline de ctx.add_basemap para ejes en EPSG:3857: dibuja el mosaico
+    del cache local debajo de los datos y agrega la atribucion de la fuente
+    """
+    xmin, xmax, ymin, ymax = ax.axis()
+    if zoom == 'auto':
+        w, s = _A_LONLAT.transform(xmin, ymin)
+        e, n = _A_LONLAT.transform(xmax, ymax)
+        zoom = calcular_zoom(w, s, e, n)
+    imagen, extent = mosaico((xmin, xmax, ymin, ymax), zoom, source, directorio)
+    ax.imshow(imagen, extent=extent, interpolation='bilinear', zorder=0)
+    # imshow cambia los limites: regresamos a los de los datos
+    ax.axis((xmin, xmax, ymin, ymax))
+    ctx.add_attribution(ax, source.get('attribution', source.name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precarga de teselas para renders sin red")
+    parser.add_argument("--bbox", nargs=4, type=float, default=BBOX_CDMX, metavar=("OESTE", "SUR", "ESTE", "NORTE"))
+    parser.add_argument("--zooms", default="10-14", help="zoom o rango de zooms, p. ej. 12 o 10-14")
+    parser.add_argument("--directorio", default=DIRECTORIO_TESELAS)
+    args = parser.parse_args()
+
+    inicio, _, fin = args.zooms.partition("-")
+    precargar_teselas(tuple(args.bbox), range(int(inicio), int(fin or inicio) + 1), directorio=args.directorio)
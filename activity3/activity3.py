@@ -6,13 +6,39 @@ from statsmodels.tsa.seasonal import seasonal_decompose
 from pmdarima import auto_arima
 from sklearn.metrics import root_mean_squared_error
 
+from registro_modelos import RegistroModelos
+from ingesta import DIRECTORIO_VENTAS, TIPOS_VENTAS, ingestar_excel, cargar_ventas
 
 
-def cargando_datos(path="data/wine_sales.xlsx"):
+def cargando_datos(path="data/wine_sales.xlsx", directorio=DIRECTORIO_VENTAS, columnas=None):
     """
-    cargando los datos
+    cargando los datos: el excel se ingiere a Parquet particionado por mes (solo los
+    meses nuevos) y se leen solo las columnas pedidas (None = todas).
+    directorio=None lee el excel completo como antes
     """
-    df = pd.read_excel(path)
+    if directorio is None:
+        return pd.read_excel(path)
+    ingestar_excel(path, directorio)
+    df = cargar_ventas(directorio, columnas)
+    return df
+
+# nombres de las columnas del excel, en orden (definidos con sus tipos en ingesta.TIPOS_VENTAS)
+COLUMNAS_VENTAS = list(TIPOS_VENTAS)
+
+def preparando_datos(df):
+    """
+    renombrando columnas y convirtiendo la fecha de int a datetime
+    (lo comparten transformando_datos y el pronostico por serie)
+    """
+    if 'date' in df.columns:
+        # ya viene de la ingesta a Parquet con nombres, tipos y fecha
+        return df
+
+    # Renombrando columnas
+    df.columns = COLUMNAS_VENTAS
+    
+    # Convirtiendo a datetime la fecha
+    df['date'] = pd.to_datetime(df['date_int'], format='%Y%m')
     return df
 
 def transformando_datos(df):
@@ -22,12 +48,7 @@ def transformando_datos(df):
         - convirtiendo la fecha de int a datetime
         - creando nuevo df con columnas utiles
     """
-    # Renombrando columnas
-    nuevas_columnas = ['id', 'date_int', 'product_name', 'price', 'sales', 'reviews', 'brand', 'searches']
-    df.columns = nuevas_columnas
-    
-    # Convirtiendo a datetime la fecha
-    df['date'] = pd.to_datetime(df['date_int'], format='%Y%m')
+    preparando_datos(df)
 
     # sumar todas las ventas de cada mes 
     # Aqui pandas devuelve una serie
@@ -74,9 +95,31 @@ def descomposicion(ts, filename="plots/decomposition.png"):
     plt.close()
     print("Grafica de descomposicion guardada...")
 
-def sarima_pipeline(ts, filename="plots/final_forecast.png"):
+# busqueda acotada de auto_arima (la comparten sarima_pipeline, multiserie y el registro)
+PARAMETROS_AUTO_ARIMA = dict(
+    seasonal=True,
+    
+    # --- CONFIGURACIÓN BLINDADA ---
+    d=1,                 # Forzamos diferencia de tendencia (evita test KPSS/ADF)
+    D=1,                 # Forzamos diferencia estacional (evita test OCSB/CH)
+    test='ignore',       # Ignorar tests de estacionariedad
+    seasonal_test='ignore', # Ignorar tests estacionales
+    
+    # Mantenemos el modelo simple
+    start_p=0, start_q=0, max_p=1, max_q=1,
+    start_P=0, start_Q=0, max_P=1, max_Q=1,
+    
+    error_action='ignore', 
+    suppress_warnings=True
+)
+
+def sarima_pipeline(ts, filename="plots/final_forecast.png", registro=None, n_pliegues=0):
     """
     como solo tenemos 
+    registro: RegistroModelos opcional; con el se reutilizan los ordenes y parametros
+    de la corrida anterior en lugar de repetir la busqueda
+    n_pliegues > 0 ademas reporta el rmse/mape por horizonte de un backtest rolling
+    origin (backtesting.backtest); cuesta una busqueda y un ajuste por pliegue mas
     """
     # train = primeros 8 meses
     train_size= len(ts) - 2
@@ -87,22 +130,13 @@ def sarima_pipeline(ts, filename="plots/final_forecast.png"):
     print(f"Datos totales: {len(ts)} | Train: {len(train)} | Test: {len(test)}")
     print("Buscando mejores parametros...")
 
-    model = auto_arima(train, 
-                        seasonal=True, m=3,
-                        
-                        # --- CONFIGURACIÓN BLINDADA ---
-                        d=1,                 # Forzamos diferencia de tendencia (evita test KPSS/ADF)
-                        D=1,                 # Forzamos diferencia estacional (evita test OCSB/CH)
-                        test='ignore',       # Ignorar tests de estacionariedad
-                        seasonal_test='ignore', # Ignorar tests estacionales
-                        
-                        # Mantenemos el modelo simple
-                        start_p=0, start_q=0, max_p=1, max_q=1,
-                        start_P=0, start_Q=0, max_P=1, max_Q=1,
-                        
-                        trace=True, 
-                        error_action='ignore', 
-                        suppress_warnings=True)
+    if registro is None:
+        model = auto_arima(train, m=3, trace=True, **PARAMETROS_AUTO_ARIMA)
+    else:
+        # solo busca de nuevo si la serie no esta en el registro o su error se disparo
+        model = registro.ajustar('total', train.to_numpy(), 3, {**PARAMETROS_AUTO_ARIMA, 'trace': True})
+        registro.guardar()
+        registro.resumen()
     print(f"Mejor modelo encontrado: {model.order} {model.seasonal_order}")
 
     # Prediccion
@@ -113,6 +147,16 @@ def sarima_pipeline(ts, filename="plots/final_forecast.png"):
     rmse = root_mean_squared_error(test, prediction)
     print(f"RMSE Error Cuadratido Medio): {rmse:.2f}")
 
+    if n_pliegues:
+        # un solo split es ruidoso: rolling origin con el mismo horizonte de 2 meses
+        # (import local: backtesting importa este modulo)
+        from backtesting import backtest
+        try:
+            resultado = backtest(ts, horizonte=len(test), n_pliegues=n_pliegues, m=3, minimo_train=6)
+            print(resultado['por_horizonte'])
+        except ValueError as e:
+            print(f"Sin backtest: {e}")
+
     # Visualizacion
     plt.figure(figsize=(12, 6))
     plt.plot(train.index, train, label='Entrenamiento', color='blue')
@@ -129,11 +173,11 @@ def sarima_pipeline(ts, filename="plots/final_forecast.png"):
     print(f"Resultado final guardado en {filename}")
 
 if __name__ == "__main__":
-    df = cargando_datos()
+    df = cargando_datos(columnas=['date', 'sales'])
     print(df.head(5))
     ts = transformando_datos(df)
     print(ts.head(12))
     # print(df_2.info())
     visualizacion_serie_tiempo(ts)
     descomposicion(ts)
-    sarima_pipeline(ts)
\ No newline at end of file
+    sarima_pipeline(ts, registro=RegistroModelos("modelos/registro.pkl"))
\ No newline at end of file
@@ -9,28 +9,32 @@ from statsmodels.tsa.seasonal import seasonal_decompose
 from pmdarima import auto_arima
 from sklearn.metrics import mean_squared_error 
 
+from activity3 import preparando_datos
+from ingesta import DIRECTORIO_VENTAS, ingestar_excel, cargar_ventas
+from backtesting import comparar_configuraciones
+
 # configuración
 plt.style.use('ggplot')
 warnings.filterwarnings("ignore")
 
 
-def cargar_datos(path="data/wine_sales.xlsx"):
+def cargar_datos(path="data/wine_sales.xlsx", directorio=DIRECTORIO_VENTAS):
     """
-    cargando los datos
+    cargando los datos (solo fecha y ventas) desde el Parquet particionado,
+    ingiriendo antes los meses nuevos del excel
     """
-    df = pd.read_excel(path)
+    ingestar_excel(path, directorio)
+    df = cargar_ventas(directorio, columnas=['date', 'sales'])
     return df
 
 def transformar_datos(df):
     """
     transformación Mensual y limpieza de outliers
     """
-    # renombrar columnas
-    nuevas_columnas = ['id', 'date_int', 'product_name', 'price', 'sales', 'reviews', 'brand', 'searches']
-    df.columns = nuevas_columnas
+    # renombrar columnas y fecha (si no viene ya de la ingesta a Parquet)
+    preparando_datos(df)
 
     # agrupando por mes y sumando las ventas por mes    
-    df['date'] = pd.to_datetime(df['date_int'], format='%Y%m')
     ventas_mensuales = df.groupby('date')['sales'].sum().sort_index()
     
     # frecuencia MS -> month start
@@ -86,9 +90,11 @@ def analizar_decomposicion(ts, filename='plots/2_decomposition.png'):
     print(f"Resultado guardado en: {filename}")
     plt.close()
 
-def sarima_pipeline(ts, filename="plots/3_final_forecast.png"):
+def sarima_pipeline(ts, filename="plots/3_final_forecast.png", n_pliegues=0):
     """
-    tranformacion logaritmica y modelo sarima
+    tranformacion logaritmica y modelo sarima evaluado en las ultimas 8 semanas.
+    n_pliegues > 0 ademas compara con backtest rolling origin el modelo con y sin
+    log (dos busquedas de auto_arima y un ajuste por pliegue mas)
     """
     print("Iniciando modelado sarima")
     
@@ -131,6 +137,16 @@ def sarima_pipeline(ts, filename="plots/3_final_forecast.png"):
     # evaluacion sobre datos reales
     rmse = np.sqrt(mean_squared_error(test_real, prediction))
     print(f"RMSE MEJORADO: {rmse:.2f}")
+
+    if n_pliegues:
+        # un solo split de 8 semanas es ruidoso: rolling origin con y sin log para ver
+        # si la transformacion paga su costo (misma busqueda de auto_arima que arriba)
+        tabla = comparar_configuraciones({
+            'semanal': dict(transformacion=None),
+            'semanal log': dict(transformacion='log'),
+        }, ts=ts, horizonte=test_weeks, n_pliegues=n_pliegues, m=4,
+           parametros=dict(seasonal=True, error_action='ignore', suppress_warnings=True))
+        print(tabla)
     
     # visualizacion
     plt.figure(figsize=(12, 6))
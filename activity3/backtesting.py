@@ -0,0 +1,169 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from pmdarima import auto_arima, ARIMA
+
+from activity3 import PARAMETROS_AUTO_ARIMA
+
+# transformaciones de la serie antes de ajustar y su inversa para el pronostico
+TRANSFORMACIONES = {
+    None: (lambda y: y, lambda y: y),
+    'log': (np.log1p, np.expm1),
+}
+
+
+def origenes_pliegues(n, horizonte, n_pliegues, paso=1, minimo_train=8):
+    """
+    origenes del rolling origin: el pliegue i entrena con y[:origen] y evalua
+    y[origen:origen + horizonte]. el ultimo origen deja exactamente horizonte datos
+    de prueba; se descartan los que dejarian menos de minimo_train para entrenar
+    """
+    origenes = n - horizonte - paso * np.arange(n_pliegues)[::-1]
+    return origenes[origenes >= minimo_train]
+
+def _evaluar_bloque(tarea):
+    """
+    pronosticos de un bloque de origenes consecutivos. con parametros_modelo (ordenes
+    ya elegidos) se ajusta una vez en el primer origen (partiendo de start_params) y
+    los siguientes solo hacen update() con las observaciones nuevas; sin ellos cada
+    origen repite auto_arima
+    """
+    y, origenes, horizonte, m, parametros_modelo, parametros_busqueda = tarea
+    resultados = []
+    modelo = None
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for origen in origenes:
+            inicio = time.perf_counter()
+            if parametros_modelo is None:
+                modelo = auto_arima(y[:origen], m=m, **parametros_busqueda)
+            elif modelo is None:
+                modelo = ARIMA(**parametros_modelo).fit(y[:origen])
+            else:
+                modelo.update(y[anterior:origen])
+            anterior = origen
+            seg_ajuste = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            pronostico = np.asarray(modelo.predict(n_periods=horizonte))
+            resultados.append((origen, pronostico, seg_ajuste, time.perf_counter() - inicio))
+    return resultados
+
+def pronosticos_sarima(y, origenes, horizonte, m=3, reutilizar=True, procesos=1, parametros=PARAMETROS_AUTO_ARIMA):
+    """
+    pronosticos del sarima en cada origen (arreglo pliegues x horizonte) y los segundos
+    de ajuste y de pronostico. ver backtest para reutilizar y procesos
+    """
+    seg_busqueda = 0.0
+    parametros_modelo = None
+    if reutilizar:
+        inicio = time.perf_counter()
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            busqueda = auto_arima(y[:origenes[0]], m=m, **parametros)
+        parametros_modelo = {**busqueda.get_params(), 'start_params': busqueda.params()}
+        seg_busqueda = time.perf_counter() - inicio
+
+    procesos = procesos or os.cpu_count()
+    bloques = [b for b in np.array_split(origenes, min(procesos, len(origenes))) if len(b)]
+    tareas = [(y, bloque, horizonte, m, parametros_modelo, parametros) for bloque in bloques]
+    if procesos == 1:
+        resultados = [_evaluar_bloque(tarea) for tarea in tareas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            # map conserva el orden de los bloques
+            resultados = list(executor.map(_evaluar_bloque, tareas))
+    resultados = [r for bloque in resultados for r in bloque]
+    pronosticos = np.array([r[1] for r in resultados])
+    return pronosticos, seg_busqueda + sum(r[2] for r in resultados), sum(r[3] for r in resultados)
+
+def backtest(ts, horizonte=2, n_pliegues=6, m=3, transformacion=None, reutilizar=True,
+             procesos=1, paso=1, minimo_train=8, parametros=PARAMETROS_AUTO_ARIMA):
+    """
+    Validacion rolling origin de un sarima sobre ts (serie con indice de fechas).
+        - transformacion: None o 'log' (log1p antes de ajustar, expm1 al pronosticar;
+          los errores siempre se miden en la escala original)
+        - reutilizar: la busqueda de auto_arima se hace una vez (primer origen) y los
+          pliegues reutilizan esos ordenes y parametros con update(); False repite
+          la busqueda en cada pliegue
+        - procesos: por defecto 1, todos los origenes en este proceso y en una sola
+          cadena de update(): el resultado no depende de la maquina. con mas procesos
+          (None usa todos los nucleos) los origenes se reparten en bloques consecutivos,
+          uno por proceso, y el primer origen de cada bloque se reajusta desde
+          start_params en lugar de llegar por update(), asi que con reutilizar=True los
+          pronosticos pueden cambiar un poco con el numero de procesos
+    regresa un dict con:
+        por_horizonte: df con rmse y mape por paso del horizonte
+        pliegues: df con origen, h, real, pronostico y error de cada pliegue
+        seg_ajuste, seg_pronostico: segundos sumados de todos los pliegues
+    """
+    directa, inversa = TRANSFORMACIONES[transformacion]
+    real = np.asarray(ts, dtype=float)
+    y = directa(real)
+    origenes = origenes_pliegues(len(y), horizonte, n_pliegues, paso, minimo_train)
+    if len(origenes) == 0:
+        raise ValueError(f"serie de {len(y)} datos muy corta para horizonte={horizonte} y minimo_train={minimo_train}")
+
+    pronosticos, seg_ajuste, seg_pronostico = pronosticos_sarima(y, origenes, horizonte, m, reutilizar, procesos, parametros)
+    pronosticos = inversa(pronosticos)
+    reales = np.array([real[origen:origen + horizonte] for origen in origenes])
+    errores = pronosticos - reales
+    # mape sin los periodos con venta 0
+    porcentuales = np.abs(errores) / np.where(reales == 0, np.nan, np.abs(reales))
+
+    por_horizonte = pd.DataFrame({
+        'rmse': np.sqrt(np.mean(errores ** 2, axis=0)),
+        'mape': np.nanmean(porcentuales, axis=0),
+    }, index=pd.Index(np.arange(1, horizonte + 1), name='h'))
+    pliegues = pd.DataFrame({
+        'origen': np.repeat(ts.index[origenes], horizonte),
+        'h': np.tile(np.arange(1, horizonte + 1), len(origenes)),
+        'real': reales.ravel(),
+        'pronostico': pronosticos.ravel(),
+        'error': errores.ravel(),
+    })
+    print(f"backtest de {len(origenes)} pliegues (h={horizonte}, transformacion={transformacion}): "
+          f"ajuste {seg_ajuste:.2f}s | pronostico {seg_pronostico:.3f}s")
+    return {'por_horizonte': por_horizonte, 'pliegues': pliegues,
+            'seg_ajuste': seg_ajuste, 'seg_pronostico': seg_pronostico}
+
+def comparar_configuraciones(configuraciones, **kwargs):
+    """
+    backtest de varias configuraciones en precision y costo.
+    configuraciones: {nombre: dict(ts=..., horizonte=..., m=..., transformacion=...)};
+    kwargs se pasan a todos los backtest. regresa un df con una fila por configuracion:
+    rmse y mape promedio de los horizontes, segundos de ajuste, de pronostico y de pared
+    """
+    filas = []
+    for nombre, configuracion in configuraciones.items():
+        print(f"{nombre}: ", end="")
+        inicio = time.perf_counter()
+        resultado = backtest(**{**kwargs, **configuracion})
+        filas.append({
+            'configuracion': nombre,
+            'rmse': resultado['por_horizonte']['rmse'].mean(),
+            'mape': resultado['por_horizonte']['mape'].mean(),
+            'seg_ajuste': resultado['seg_ajuste'],
+            'seg_pronostico': resultado['seg_pronostico'],
+            'seg_pared': time.perf_counter() - inicio,
+        })
+    return pd.DataFrame(filas).set_index('configuracion')
+
+
+if __name__ == "__main__":
+    from activity3_3 import cargar_datos, transformar_datos, cambiar_meses_a_semanas
+
+    mensual = transformar_datos(cargar_datos())
+    semanal = cambiar_meses_a_semanas(mensual)
+    # mismos 2 meses de prueba que activity3.py y 8 semanas que activity3_3.py
+    tabla = comparar_configuraciones({
+        'mensual': dict(ts=mensual, horizonte=2, m=3, minimo_train=6),
+        'mensual log': dict(ts=mensual, horizonte=2, m=3, minimo_train=6, transformacion='log'),
+        'semanal': dict(ts=semanal, horizonte=8, m=4),
+        'semanal log': dict(ts=semanal, horizonte=8, m=4, transformacion='log'),
+    }, n_pliegues=4)
+    print(tabla)
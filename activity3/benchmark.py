@@ -0,0 +1,191 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from activity3 import COLUMNAS_VENTAS, preparando_datos
+from multiserie import construir_series, pronosticar_series
+from registro_modelos import RegistroModelos
+from backtesting import backtest, comparar_configuraciones
+from modelos_rapidos import seleccionar_series
+from ingesta import ingestar_excel, cargar_ventas
+
+
+def generar_ventas(n_productos=200, n_marcas=20, meses=36, semilla=42):
+    """
+    generando un excel sintetico de ventas (mismas columnas que wine_sales.xlsx):
+    un registro por producto y mes con tendencia, estacionalidad trimestral y ruido
+    """
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range("2021-01-01", periods=meses, freq="MS")
+    producto = np.repeat(np.arange(n_productos), meses)
+    mes = np.tile(np.arange(meses), n_productos)
+    nivel = rng.uniform(50, 5_000, n_productos)[producto]
+    tendencia = rng.normal(0, 0.01, n_productos)[producto] * mes
+    estacional = 0.2 * np.sin(2 * np.pi * mes / 3 + rng.uniform(0, 2 * np.pi, n_productos)[producto])
+    ventas = np.maximum(nivel * (1 + tendencia + estacional + rng.normal(0, 0.05, len(mes))), 0).round()
+    df = pd.DataFrame({
+        'id': np.arange(len(mes)),
+        'date_int': fechas.strftime("%Y%m").astype(int)[mes],
+        'product_name': [f"Vino {p:04d}" for p in producto],
+        'price': rng.uniform(100, 900, n_productos)[producto].round(2),
+        'sales': ventas,
+        'reviews': rng.integers(0, 500, len(mes)),
+        'brand': [f"Marca {p % n_marcas:02d}" for p in producto],
+        'searches': rng.integers(0, 5_000, len(mes)),
+    })
+    df.columns = COLUMNAS_VENTAS
+    return df
+
+def benchmark_multiserie(n_productos=60, procesos=(1, None)):
+    """
+    series por segundo del motor multiserie por producto, en un proceso y en el pool
+    """
+    print("Benchmark multiserie")
+    df = preparando_datos(generar_ventas(n_productos))
+    inicio = time.perf_counter()
+    tabla = construir_series(df, por=('brand', 'product_name'))
+    print(f"  pivot de {tabla.shape[1]} series: {time.perf_counter() - inicio:.3f}s")
+    for n_procesos in procesos:
+        print(f"  procesos={n_procesos}: ", end="")
+        resultado = pronosticar_series(tabla, horizonte=3, m=3, procesos=n_procesos, timeout=10)
+    print(resultado.drop_duplicates(['brand', 'product_name'])['modelo'].str.split('(').str[0].value_counts().to_string())
+
+def benchmark_registro(n_productos=60, meses=36):
+    """
+    refresco nocturno: la tabla gana un mes. busqueda completa de auto_arima en
+    todas las series contra el registro de la noche anterior
+    """
+    print("Benchmark registro de modelos")
+    tabla = construir_series(preparando_datos(generar_ventas(n_productos, meses=meses)), por=('brand', 'product_name'))
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "registro.pkl")
+        print("  noche anterior (registro vacio): ", end="")
+        pronosticar_series(tabla.iloc[:-1], horizonte=3, procesos=1, timeout=10, registro=RegistroModelos(ruta))
+
+        print("  busqueda completa: ", end="")
+        inicio = time.perf_counter()
+        completa = pronosticar_series(tabla, horizonte=3, procesos=1, timeout=10)
+        t_completa = time.perf_counter() - inicio
+
+        print("  con registro: ", end="")
+        inicio = time.perf_counter()
+        con_registro = pronosticar_series(tabla, horizonte=3, procesos=1, timeout=10, registro=RegistroModelos(ruta))
+        t_registro = time.perf_counter() - inicio
+
+    diferencia = np.abs(con_registro['pronostico'] - completa['pronostico']) / np.maximum(completa['pronostico'].abs(), 1)
+    print(f"  {t_completa:.2f}s -> {t_registro:.2f}s ({t_completa / t_registro:.1f}x) | "
+          f"diferencia relativa del pronostico: mediana {diferencia.median():.2%}, max {diferencia.max():.2%}")
+
+def benchmark_backtest(meses=60, n_pliegues=12):
+    """
+    rolling origin sobre las ventas totales: repitiendo auto_arima en cada pliegue
+    contra reutilizar la busqueda con update(), en un proceso y en el pool. al final
+    la comparacion de transformacion log y semanas interpoladas (activity3_3)
+    """
+    from activity3_3 import transformar_datos, cambiar_meses_a_semanas
+
+    print("Benchmark backtest")
+    mensual = transformar_datos(generar_ventas(40, meses=meses))
+    for reutilizar, procesos in ((False, 1), (True, 1), (True, None)):
+        print(f"  reutilizar={reutilizar}, procesos={procesos}: ", end="")
+        inicio = time.perf_counter()
+        resultado = backtest(mensual, horizonte=2, n_pliegues=n_pliegues, reutilizar=reutilizar, procesos=procesos)
+        print(f"    {time.perf_counter() - inicio:.2f}s de pared | rmse por h: "
+              f"{np.round(resultado['por_horizonte']['rmse'].to_numpy(), 1)}")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        semanal = cambiar_meses_a_semanas(mensual, filename=os.path.join(directorio, "semanas.png"))
+    tabla = comparar_configuraciones({
+        'mensual': dict(ts=mensual, horizonte=2, m=3),
+        'mensual log': dict(ts=mensual, horizonte=2, m=3, transformacion='log'),
+        'semanal': dict(ts=semanal, horizonte=8, m=4),
+        'semanal log': dict(ts=semanal, horizonte=8, m=4, transformacion='log'),
+    }, n_pliegues=n_pliegues, procesos=1)
+    print(tabla.round(3).to_string())
+
+def benchmark_seleccion(n_productos=60, meses=36, horizonte=3):
+    """
+    sarima en todas las series contra el selector (modelos baratos y sarima solo si
+    no alcanzan el umbral): segundos y error relativo en los ultimos meses guardados
+    """
+    print("Benchmark seleccion de modelos")
+    tabla = construir_series(preparando_datos(generar_ventas(n_productos, meses=meses)), por=('brand', 'product_name'))
+    entrenamiento, prueba = tabla.iloc[:-horizonte], tabla.iloc[-horizonte:]
+    reales = prueba.to_numpy().T.ravel()
+
+    for nombre, funcion in (("sarima en todas", lambda: pronosticar_series(entrenamiento, horizonte=horizonte, procesos=1, timeout=10)),
+                            ("selector", lambda: seleccionar_series(entrenamiento, horizonte=horizonte, procesos=1))):
+        print(f"  {nombre}: ", end="")
+        inicio = time.perf_counter()
+        resultado = funcion()
+        segundos = time.perf_counter() - inicio
+        error = np.sqrt(np.mean((resultado['pronostico'].to_numpy() - reales) ** 2)) / np.mean(np.abs(reales))
+        print(f"    {segundos:.2f}s | error relativo en prueba {error:.3f}")
+        print("    " + resultado.drop_duplicates(['brand', 'product_name'])['modelo'].str.split('(').str[0].value_counts().to_dict().__repr__())
+
+def escribir_excel(df, ruta):
+    """
+    escribiendo df como xlsx en modo write_only (pandas.to_excel es muy lento para
+    cientos de miles de filas)
+    """
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(list(df.columns))
+    for fila in df.itertuples(index=False):
+        hoja.append(list(fila))
+    libro.save(ruta)
+
+def benchmark_ingesta(n_productos=2_000, meses=36):
+    """
+    pd.read_excel + preparando_datos en cada corrida contra la ingesta a Parquet:
+    primera ingesta (con el penultimo mes a medias), lecturas siguientes (solo date y
+    sales) y una exportacion nueva con un mes mas y el penultimo completo (se agrega
+    ese mes y se reescribe el penultimo)
+    """
+    print("Benchmark ingesta")
+    ventas = generar_ventas(n_productos, meses=meses)
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, "wine_sales.xlsx")
+        destino = os.path.join(directorio, "ventas")
+        meses_venta = np.sort(ventas['date_int'].unique())
+        # exportacion a medio mes: el penultimo mes solo con la mitad de sus filas
+        a_medias = ventas[ventas['date_int'] == meses_venta[-2]]
+        parcial = ventas[ventas['date_int'] < meses_venta[-2]]
+        escribir_excel(pd.concat([parcial, a_medias.iloc[:len(a_medias) // 2]]), ruta)
+
+        inicio = time.perf_counter()
+        df = preparando_datos(pd.read_excel(ruta))
+        t_excel = time.perf_counter() - inicio
+        print(f"  read_excel completo: {len(df)} filas en {t_excel:.2f}s")
+
+        print("  primera ingesta: ", end="")
+        inicio = time.perf_counter()
+        ingestar_excel(ruta, destino)
+        print(f"    {time.perf_counter() - inicio:.2f}s")
+
+        inicio = time.perf_counter()
+        ingestar_excel(ruta, destino)
+        df = cargar_ventas(destino, columnas=['date', 'sales'])
+        t_parquet = time.perf_counter() - inicio
+        print(f"  siguientes corridas (date, sales): {len(df)} filas en {t_parquet:.3f}s ({t_excel / t_parquet:.0f}x)")
+
+        escribir_excel(ventas, ruta)
+        print("  exportacion con un mes nuevo y el anterior completo: ", end="")
+        inicio = time.perf_counter()
+        nuevos = ingestar_excel(ruta, destino)
+        print(f"    meses agregados o reescritos {nuevos} en {time.perf_counter() - inicio:.2f}s")
+        completo = cargar_ventas(destino).sort_values('id', ignore_index=True)
+        esperado = preparando_datos(ventas.copy())
+        print(f"  mismas filas y ventas que el excel: {len(completo) == len(esperado) and np.allclose(completo['sales'], esperado['sales'])}")
+
+
+if __name__ == "__main__":
+    benchmark_multiserie()
+    benchmark_registro()
+    benchmark_backtest()
+    benchmark_seleccion()
+    benchmark_ingesta()
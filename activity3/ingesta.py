@@ -0,0 +1,150 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from openpyxl import load_workbook
+
+DIRECTORIO_VENTAS = "data/ventas"
+# columnas del excel en orden y sus tipos: el unico lugar donde se definen (de aqui
+# salen activity3.COLUMNAS_VENTAS y el renombrado por posicion de preparando_datos);
+# date se agrega al ingerir a partir de date_int
+TIPOS_VENTAS = {
+    'id': 'Int64', 'date_int': 'Int32', 'product_name': 'string', 'price': 'float64',
+    'sales': 'float64', 'reviews': 'Int64', 'brand': 'string', 'searches': 'Int64',
+}
+
+PARTICIONES = ds.partitioning(pa.schema([('date_int', pa.int32())]), flavor="hive")
+
+
+def huella_archivo(ruta):
+    """
+    huella barata del excel: tamaño y fecha de modificacion
+    """
+    estado = os.stat(ruta)
+    return hashlib.sha256(f"{os.path.basename(ruta)}:{estado.st_size}:{estado.st_mtime_ns}".encode()).hexdigest()
+
+def meses_ingeridos(directorio=DIRECTORIO_VENTAS):
+    """
+    meses (date_int) que ya tienen particion en directorio
+    """
+    if not os.path.isdir(directorio):
+        return set()
+    return {int(nombre.split("=")[1]) for nombre in os.listdir(directorio) if nombre.startswith("date_int=")}
+
+def _bloque_a_tabla(filas):
+    """
+    filas crudas del excel -> tabla de arrow con los tipos de TIPOS_VENTAS y la fecha
+    """
+    df = pd.DataFrame(filas, columns=list(TIPOS_VENTAS)).astype(TIPOS_VENTAS)
+    df['date'] = pd.to_datetime(df['date_int'].astype(str), format='%Y%m')
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+def leer_excel_por_bloques(ruta, tamanio_bloque=50_000, omitir_meses=(), huellas=None):
+    """
+    Leyendo el excel en modo read_only (sin cargar el libro completo en memoria) y
+    regresando tablas de arrow de hasta tamanio_bloque filas. las filas de los meses
+    en omitir_meses o sin fecha se descartan antes de convertirlas.
+    con huellas (dict) se va acumulando el sha256 de las filas de cada mes, incluidas
+    las omitidas
+    """
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        filas = []
+        descartadas = 0
+        for fila in hoja.iter_rows(min_row=2, max_col=len(TIPOS_VENTAS), values_only=True):
+            mes = None if fila[1] is None else int(fila[1])
+            if huellas is not None and mes is not None:
+                if mes not in huellas:
+                    huellas[mes] = hashlib.sha256()
+                huellas[mes].update(repr(fila).encode())
+            if mes is None or mes in omitir_meses:
+                descartadas += 1
+                continue
+            filas.append(fila)
+            if len(filas) == tamanio_bloque:
+                yield _bloque_a_tabla(filas)
+                filas = []
+        if filas:
+            yield _bloque_a_tabla(filas)
+        print(f"{descartadas} filas omitidas (meses que no se escriben o sin fecha)")
+    finally:
+        libro.close()
+
+def _escribir_bloques(tablas, directorio, prefijo):
+    filas = 0
+    for i, tabla in enumerate(tablas):
+        filas += tabla.num_rows
+        ds.write_dataset(tabla, directorio, format="parquet", partitioning=PARTICIONES,
+                         basename_template=f"{prefijo}-{i:05d}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore")
+    return filas
+
+def ingestar_excel(ruta, directorio=DIRECTORIO_VENTAS, tamanio_bloque=50_000):
+    """
+    Convirtiendo el excel de ventas a Parquet particionado por mes (date_int=AAAAMM).
+        - si el excel no cambio desde la ultima ingesta (misma huella) no se abre
+        - los meses nuevos se escriben en la misma lectura del excel; los que ya
+          tienen particion no se convierten
+        - en _ingesta.json se guarda la huella de las filas de cada mes: los meses ya
+          ingeridos cuyas filas cambiaron (por ejemplo un mes que en la exportacion
+          anterior venia incompleto) se reescriben con una segunda lectura
+        - todo se escribe en una carpeta temporal y se mueve al final, asi una
+          ingesta interrumpida no deja particiones a medias
+    regresa los meses agregados o reescritos
+    """
+    if not os.path.exists(ruta):
+        raise FileNotFoundError(ruta)
+    ruta_estado = os.path.join(directorio, "_ingesta.json")
+    huella = huella_archivo(ruta)
+    estado = {}
+    if os.path.exists(ruta_estado):
+        with open(ruta_estado) as archivo:
+            estado = json.load(archivo)
+        if estado.get('huella') == huella:
+            print(f"{ruta} sin cambios, nada que ingerir")
+            return []
+
+    os.makedirs(directorio, exist_ok=True)
+    existentes = meses_ingeridos(directorio)
+    # los estados anteriores sin huellas por mes reescriben todos los meses una vez
+    huellas_previas = estado.get('huellas_meses', {})
+    temporal = os.path.join(directorio, "_tmp")
+    shutil.rmtree(temporal, ignore_errors=True)
+    inicio = time.perf_counter()
+    huellas = {}
+    filas = _escribir_bloques(leer_excel_por_bloques(ruta, tamanio_bloque, existentes, huellas), temporal, "parte")
+    huellas = {mes: h.hexdigest() for mes, h in huellas.items()}
+
+    cambiados = {mes for mes in existentes & set(huellas) if huellas_previas.get(str(mes)) != huellas[mes]}
+    if cambiados:
+        print(f"meses con cambios desde la ultima ingesta: {sorted(cambiados)}")
+        filas += _escribir_bloques(leer_excel_por_bloques(ruta, tamanio_bloque, set(huellas) - cambiados),
+                                   temporal, "cambio")
+
+    escritos = sorted(meses_ingeridos(temporal))
+    for mes in escritos:
+        destino = os.path.join(directorio, f"date_int={mes}")
+        # si se interrumpe aqui el mes queda sin particion y la siguiente ingesta lo agrega
+        shutil.rmtree(destino, ignore_errors=True)
+        os.replace(os.path.join(temporal, f"date_int={mes}"), destino)
+    shutil.rmtree(temporal, ignore_errors=True)
+    huellas_meses = {**huellas_previas, **{str(mes): huellas[mes] for mes in escritos}}
+    with open(ruta_estado + ".tmp", "w") as archivo:
+        json.dump({'huella': huella, 'huellas_meses': huellas_meses}, archivo)
+    os.replace(ruta_estado + ".tmp", ruta_estado)
+    print(f"{filas} filas de {len(escritos)} meses nuevos o con cambios ingeridas en {time.perf_counter() - inicio:.2f}s")
+    return escritos
+
+def cargar_ventas(directorio=DIRECTORIO_VENTAS, columnas=None, desde=None):
+    """
+    Cargando las ventas ingeridas: solo las columnas pedidas (None = todas) y, con
+    desde (AAAAMM), solo las particiones de ese mes en adelante
+    """
+    # _ingesta.json y _tmp se ignoran por el prefijo _
+    dataset = ds.dataset(directorio, format="parquet", partitioning=PARTICIONES)
+    filtro = None if desde is None else ds.field('date_int') >= desde
+    return dataset.to_table(columns=columnas, filter=filtro).to_pandas()
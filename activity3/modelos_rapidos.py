@@ -0,0 +1,170 @@
+import os
+import time
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from statsmodels.tsa.holtwinters import ExponentialSmoothing
+from statsmodels.tsa.forecasting.theta import ThetaModel
+
+from activity3 import cargando_datos, preparando_datos
+from multiserie import construir_series, _naive_estacional, _sarima
+from backtesting import origenes_pliegues, pronosticos_sarima
+
+
+def _ets(y, horizonte, m):
+    """
+    holt-winters aditivo con tendencia amortiguada (sin estacionalidad si hay menos de
+    3 ciclos). sin la busqueda de fuerza bruta de valores iniciales: 4x mas rapido
+    """
+    estacional = 'add' if len(y) >= 3 * m else None
+    modelo = ExponentialSmoothing(y, trend='add', damped_trend=True, seasonal=estacional,
+                                  seasonal_periods=m if estacional else None).fit(use_brute=False)
+    return np.asarray(modelo.forecast(horizonte))
+
+def _theta(y, horizonte, m):
+    """
+    theta con desestacionalizacion aditiva (acepta ventas en 0)
+    """
+    modelo = ThetaModel(y, period=m, deseasonalize=len(y) >= 2 * m, method='additive').fit()
+    return np.asarray(modelo.forecast(horizonte))
+
+# modelos baratos: funcion(y, horizonte, m) -> pronostico. para agregar otro basta
+# con registrarlo aqui
+MODELOS_RAPIDOS = {
+    'naive_estacional': lambda y, horizonte, m: _naive_estacional(y, horizonte, m)[0],
+    'ets': _ets,
+    'theta': _theta,
+}
+
+
+def error_relativo(pronosticos, reales):
+    """
+    rmse de todos los pliegues y horizontes entre el promedio de las ventas reales
+    (comparable entre series de distinto volumen)
+    """
+    rmse = np.sqrt(np.mean((pronosticos - reales) ** 2))
+    escala = np.mean(np.abs(reales))
+    if escala == 0:
+        return 0.0 if rmse == 0 else np.inf
+    return float(rmse / escala)
+
+def _pronosticos_rapidos(funcion, y, origenes, horizonte, m):
+    # los modelos baratos se reajustan en cada origen; si fallan su error es infinito
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            return np.array([funcion(y[:origen], horizonte, m) for origen in origenes])
+    except Exception:
+        return None
+
+def seleccionar_modelo(y, horizonte=2, m=3, n_pliegues=4, umbral=0.15, minimo_train=8):
+    """
+    Eligiendo el modelo de una serie por backtest rolling origin:
+        - se evaluan todos los MODELOS_RAPIDOS en los mismos pliegues
+        - si el mejor tiene error_relativo <= umbral se usa ese
+        - si no, se escala a sarima (backtest con la busqueda reutilizada) y se queda
+          el que tenga menor error
+    regresa un dict con el pronostico final (ajustado con toda la serie), modelo,
+    escalado, error_relativo de cada candidato evaluado, segundos y segundos de sarima
+    """
+    inicio = time.perf_counter()
+    y = np.asarray(y, dtype=float)
+    origenes = origenes_pliegues(len(y), horizonte, n_pliegues, minimo_train=minimo_train)
+    errores = {}
+    if len(origenes):
+        reales = np.array([y[origen:origen + horizonte] for origen in origenes])
+        for nombre, funcion in MODELOS_RAPIDOS.items():
+            pronosticos = _pronosticos_rapidos(funcion, y, origenes, horizonte, m)
+            errores[nombre] = np.inf if pronosticos is None else error_relativo(pronosticos, reales)
+    mejor = min(errores, key=errores.get) if errores else 'naive_estacional'
+
+    seg_sarima = 0.0
+    # las series constantes o sin pliegues no se escalan: sarima no tiene con que evaluarse
+    if errores and errores[mejor] > umbral and not np.all(y == y[0]):
+        inicio_sarima = time.perf_counter()
+        try:
+            pronosticos, _, _ = pronosticos_sarima(y, origenes, horizonte, m)
+            errores['sarima'] = error_relativo(pronosticos, reales)
+        except Exception:
+            errores['sarima'] = np.inf
+        if errores['sarima'] < errores[mejor]:
+            mejor = 'sarima'
+        seg_sarima = time.perf_counter() - inicio_sarima
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            if mejor == 'sarima':
+                inicio_sarima = time.perf_counter()
+                pronostico = _sarima(y, horizonte, m)[0]
+                seg_sarima += time.perf_counter() - inicio_sarima
+            else:
+                pronostico = MODELOS_RAPIDOS[mejor](y, horizonte, m)
+        except Exception:
+            # series muy cortas para cualquier modelo: se repite el ultimo valor
+            mejor, pronostico = 'naive', np.full(horizonte, y[-1])
+    return {
+        'pronostico': pronostico, 'modelo': mejor, 'escalado': 'sarima' in errores, 'errores': errores,
+        'segundos': time.perf_counter() - inicio, 'seg_sarima': seg_sarima
+    }
+
+def _trabajo_seleccion(argumentos):
+    serie_id, y, kwargs = argumentos
+    return {'serie_id': serie_id, **seleccionar_modelo(y, **kwargs)}
+
+def seleccionar_series(tabla, horizonte=2, m=3, n_pliegues=4, umbral=0.15, procesos=None):
+    """
+    seleccionar_modelo para todas las columnas de construir_series en un pool de
+    procesos. reporta cuantas series se escalaron a sarima y el computo ahorrado
+    (estimado con el costo promedio de sarima en las series escaladas).
+    regresa un df ordenado (una fila por serie y fecha) con: columnas del grupo, date,
+    pronostico, modelo, escalado, error_relativo (del modelo elegido), segundos
+    """
+    fechas = pd.date_range(tabla.index[-1], periods=horizonte + 1, freq=tabla.index.freq)[1:]
+    kwargs = dict(horizonte=horizonte, m=m, n_pliegues=n_pliegues, umbral=umbral)
+    trabajos = [(serie_id, tabla[serie_id].to_numpy(), kwargs) for serie_id in tabla.columns]
+
+    inicio = time.perf_counter()
+    if procesos == 1:
+        resultados = [_trabajo_seleccion(trabajo) for trabajo in trabajos]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos or os.cpu_count()) as executor:
+            # map conserva el orden de las series
+            resultados = list(executor.map(_trabajo_seleccion, trabajos, chunksize=max(1, len(trabajos) // 64)))
+    segundos = time.perf_counter() - inicio
+
+    escaladas = [r for r in resultados if r['escalado']]
+    print(f"{len(resultados)} series en {segundos:.2f}s | {len(escaladas)} escaladas a sarima, "
+          f"{sum(r['modelo'] == 'sarima' for r in resultados)} se quedaron con sarima")
+    if escaladas:
+        costo_sarima = np.mean([r['seg_sarima'] for r in escaladas])
+        ahorro = costo_sarima * (len(resultados) - len(escaladas))
+        print(f"sarima cuesta {costo_sarima:.2f}s por serie: ~{ahorro:.1f}s ahorrados en las "
+              f"{len(resultados) - len(escaladas)} series que no lo necesitaron")
+
+    n = len(resultados)
+    claves = pd.MultiIndex.from_tuples(
+        [r['serie_id'] if isinstance(r['serie_id'], tuple) else (r['serie_id'],) for r in resultados],
+        names=tabla.columns.names
+    )
+    pronostico = pd.DataFrame({
+        'date': np.tile(fechas, n),
+        'pronostico': np.concatenate([r['pronostico'] for r in resultados]),
+        'modelo': np.repeat([r['modelo'] for r in resultados], horizonte),
+        'escalado': np.repeat([r['escalado'] for r in resultados], horizonte),
+        'error_relativo': np.repeat([r['errores'].get(r['modelo'], np.nan) for r in resultados], horizonte),
+        'segundos': np.repeat([r['segundos'] for r in resultados], horizonte),
+    })
+    for nivel, nombre in enumerate(claves.names):
+        pronostico.insert(nivel, nombre, np.repeat(claves.get_level_values(nivel), horizonte))
+    return pronostico
+
+
+if __name__ == "__main__":
+    df = preparando_datos(cargando_datos())
+    tabla = construir_series(df, por=('brand',))
+    resultado = seleccionar_series(tabla, horizonte=2, m=3, n_pliegues=2, umbral=0.15)
+    print(resultado.head(12))
+    print(resultado.drop_duplicates(list(tabla.columns.names))['modelo'].value_counts())
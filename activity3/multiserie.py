@@ -0,0 +1,179 @@
+import time
+import signal
+import warnings
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+
+from activity3 import cargando_datos, preparando_datos, PARAMETROS_AUTO_ARIMA
+from registro_modelos import RegistroModelos, ajustar_con_registro
+
+
+def construir_series(df, por=('brand',), freq='MS', valor='sales'):
+    """
+    una serie por grupo en un solo pivot: filas = fechas (con frecuencia freq y
+    los periodos faltantes en 0), columnas = cada combinacion de las columnas por.
+    df debe venir de preparando_datos
+    """
+    por = list(por)
+    tabla = df.pivot_table(index='date', columns=por, values=valor, aggfunc='sum', fill_value=0)
+    tabla = tabla.asfreq(freq).fillna(0).sort_index(axis=1)
+    print(f"{tabla.shape[1]} series de {len(tabla)} periodos")
+    return tabla
+
+class _TiempoAgotado(Exception):
+    pass
+
+def _alarma(signum, frame):
+    raise _TiempoAgotado()
+
+def _con_limite(segundos, funcion, *args):
+    """
+    corriendo funcion con un limite de tiempo (SIGALRM, solo en unix; en otros
+    sistemas se corre sin limite)
+    """
+    if not segundos or not hasattr(signal, "setitimer"):
+        return funcion(*args)
+    anterior = signal.signal(signal.SIGALRM, _alarma)
+    signal.setitimer(signal.ITIMER_REAL, segundos)
+    try:
+        return funcion(*args)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, anterior)
+
+def _sarima(y, horizonte, m, previo=None, umbral=2.0):
+    """
+    sarima con el registro previo de la serie (ver ajustar_con_registro); ademas del
+    pronostico regresa (registro nuevo, accion)
+    """
+    modelo, registro, accion = ajustar_con_registro(y, m, PARAMETROS_AUTO_ARIMA, previo, umbral)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        pronostico, intervalo = modelo.predict(n_periods=horizonte, return_conf_int=True)
+    nombre = f"sarima{modelo.order}{modelo.seasonal_order}"
+    return np.asarray(pronostico), intervalo[:, 0], intervalo[:, 1], nombre, (registro, accion)
+
+def _naive_estacional(y, horizonte, m):
+    """
+    repite el ultimo ciclo de m periodos; intervalo con la dispersion de las diferencias estacionales
+    """
+    if len(y) < 2 * m:
+        raise ValueError("serie mas corta que dos ciclos")
+    pasos = np.arange(horizonte)
+    pronostico = y[-m:][pasos % m]
+    sigma = np.std(y[m:] - y[:-m])
+    ancho = 1.96 * sigma * np.sqrt(pasos // m + 1)
+    return pronostico, pronostico - ancho, pronostico + ancho, "naive_estacional"
+
+def _naive(y, horizonte, m):
+    """
+    repite el ultimo valor (siempre funciona si hay al menos un dato)
+    """
+    pronostico = np.full(horizonte, y[-1], dtype=float)
+    sigma = np.std(np.diff(y)) if len(y) > 1 else 0.0
+    ancho = 1.96 * sigma * np.sqrt(np.arange(1, horizonte + 1))
+    return pronostico, pronostico - ancho, pronostico + ancho, "naive"
+
+# orden de los modelos: si uno falla o se pasa de tiempo se usa el siguiente
+CADENA_MODELOS = (_sarima, _naive_estacional, _naive)
+
+def pronosticar_serie(serie_id, y, horizonte=2, m=3, timeout=30, previo=None, umbral=2.0):
+    """
+    pronostico de una sola serie con la cadena de respaldo. regresa un dict con el
+    pronostico, intervalos, modelo usado, estado (ok / motivo del respaldo), segundos
+    y el registro del sarima (None si se uso un respaldo). si ningun modelo funciona
+    el pronostico es NaN, el modelo "ninguno" y el estado lista los errores
+    """
+    inicio = time.perf_counter()
+    y = np.asarray(y, dtype=float)
+    estados = []
+    # si fallan todos los modelos (serie vacia, todo NaN...) queda un registro de falla
+    pronostico = inferior = superior = np.full(horizonte, np.nan)
+    nombre, registro = "ninguno", None
+    for modelo in CADENA_MODELOS:
+        # sin limite para los respaldos, son instantaneos
+        limite = timeout if modelo is _sarima else None
+        argumentos = (y, horizonte, m, previo, umbral) if modelo is _sarima else (y, horizonte, m)
+        try:
+            if modelo is _sarima and np.all(y == y[0]):
+                raise ValueError("serie constante")
+            salida = _con_limite(limite, modelo, *argumentos)
+            if not np.all(np.isfinite(salida[0])):
+                raise ValueError("pronostico no finito")
+            pronostico, inferior, superior, nombre, *registro = salida
+            break
+        except _TiempoAgotado:
+            estados.append(f"{modelo.__name__.strip('_')}: tiempo agotado ({timeout}s)")
+        except Exception as e:
+            estados.append(f"{modelo.__name__.strip('_')}: {e}")
+    return {
+        'serie_id': serie_id, 'pronostico': pronostico, 'inferior': inferior, 'superior': superior,
+        'modelo': nombre, 'estado': "; ".join(estados) or "ok", 'segundos': time.perf_counter() - inicio,
+        'registro': registro[0] if registro else None
+    }
+
+def _trabajo_serie(argumentos):
+    return pronosticar_serie(*argumentos)
+
+def pronosticar_series(tabla, horizonte=2, m=3, procesos=None, timeout=30, registro=None, umbral=2.0):
+    """
+    Pronosticando todas las columnas de construir_series en un pool de procesos.
+    cada serie tiene su limite de tiempo y cadena de respaldo (sarima -> naive
+    estacional -> naive). con un RegistroModelos la busqueda de auto_arima solo se
+    repite en las series nuevas o con deriva (las demas se actualizan o reajustan) y
+    el registro se guarda al terminar. regresa un df ordenado (una fila por serie y
+    fecha) con: columnas del grupo, date, pronostico, inferior, superior, modelo, estado, segundos
+    """
+    fechas = pd.date_range(tabla.index[-1], periods=horizonte + 1, freq=tabla.index.freq)[1:]
+    trabajos = [
+        (serie_id, tabla[serie_id].to_numpy(), horizonte, m, timeout,
+         registro.previo(serie_id) if registro is not None else None, umbral)
+        for serie_id in tabla.columns
+    ]
+
+    inicio = time.perf_counter()
+    if procesos == 1:
+        resultados = [_trabajo_serie(trabajo) for trabajo in trabajos]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            # map conserva el orden de las series
+            resultados = list(executor.map(_trabajo_serie, trabajos, chunksize=max(1, len(trabajos) // 64)))
+    segundos = time.perf_counter() - inicio
+    print(f"{len(resultados)} series pronosticadas en {segundos:.2f}s ({len(resultados) / segundos:.1f} series/s)")
+
+    if registro is not None:
+        # las series que cayeron en un respaldo conservan su registro anterior
+        for r in resultados:
+            if r['registro'] is not None:
+                registro.actualizar(r['serie_id'], *r['registro'])
+        registro.guardar()
+        registro.resumen()
+
+    # armando el df ordenado de una vez con arreglos (sin concatenar un df por serie)
+    n = len(resultados)
+    claves = pd.MultiIndex.from_tuples(
+        [r['serie_id'] if isinstance(r['serie_id'], tuple) else (r['serie_id'],) for r in resultados],
+        names=tabla.columns.names
+    )
+    pronostico = pd.DataFrame({
+        'date': np.tile(fechas, n),
+        'pronostico': np.concatenate([r['pronostico'] for r in resultados]),
+        'inferior': np.concatenate([r['inferior'] for r in resultados]),
+        'superior': np.concatenate([r['superior'] for r in resultados]),
+        'modelo': np.repeat([r['modelo'] for r in resultados], horizonte),
+        'estado': np.repeat([r['estado'] for r in resultados], horizonte),
+        'segundos': np.repeat([r['segundos'] for r in resultados], horizonte),
+    })
+    for nivel, nombre in enumerate(claves.names):
+        pronostico.insert(nivel, nombre, np.repeat(claves.get_level_values(nivel), horizonte))
+    return pronostico
+
+
+if __name__ == "__main__":
+    df = preparando_datos(cargando_datos())
+    tabla = construir_series(df, por=('brand',))
+    resultado = pronosticar_series(tabla, horizonte=2, m=3, registro=RegistroModelos("modelos/registro_series.pkl"))
+    print(resultado.head(12))
+    # series por modelo usado
+    print(resultado.drop_duplicates(list(tabla.columns.names))['modelo'].value_counts())
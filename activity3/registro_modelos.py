@@ -0,0 +1,107 @@
+import os
+import copy
+import pickle
+import hashlib
+import warnings
+import numpy as np
+
+from pmdarima import auto_arima, ARIMA
+
+# lo que puede pasar con cada serie al ajustarla con el registro
+ACCIONES = ('reutilizado', 'actualizado', 'reajustado', 'busqueda', 'deriva')
+
+
+def huella_serie(y, m):
+    """
+    huella de los datos de una serie (valores y periodo estacional)
+    """
+    return hashlib.sha256(np.asarray(y, dtype=float).tobytes() + f":{m}".encode()).hexdigest()
+
+def _sigma(modelo):
+    # desviacion de las innovaciones estimada por el modelo (el ultimo parametro es sigma2)
+    return float(np.sqrt(modelo.params()[-1]))
+
+def _registro(modelo, y, m, sigma_base):
+    return {
+        'huella': huella_serie(y, m), 'y': y.copy(), 'm': m,
+        'order': modelo.order, 'seasonal_order': modelo.seasonal_order,
+        'params': modelo.params(), 'sigma_base': sigma_base, 'modelo': modelo
+    }
+
+def ajustar_con_registro(y, m, parametros, previo=None, umbral=2.0):
+    """
+    Ajustando un sarima reutilizando el registro previo de la serie (si hay):
+        - mismos datos: se reutiliza el modelo guardado
+        - la serie solo gano observaciones al final: update() del modelo guardado,
+          salvo que el error de su pronostico en esos datos pase de umbral veces la
+          sigma de la ultima busqueda (deriva)
+        - cambio la historia: se reajustan los mismos ordenes partiendo de los parametros previos
+        - sin registro o con deriva: busqueda completa con auto_arima(**parametros)
+    regresa (modelo, registro nuevo, accion)
+    """
+    y = np.asarray(y, dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        accion = 'busqueda'
+        if previo is not None and previo['m'] == m:
+            if previo['huella'] == huella_serie(y, m):
+                return previo['modelo'], previo, 'reutilizado'
+
+            anterior = previo['y']
+            if len(y) > len(anterior) and np.array_equal(y[:len(anterior)], anterior):
+                nuevos = y[len(anterior):]
+                error = np.sqrt(np.mean((previo['modelo'].predict(n_periods=len(nuevos)) - nuevos) ** 2))
+                if error <= umbral * previo['sigma_base']:
+                    # copia para no modificar el modelo del registro previo
+                    modelo = copy.deepcopy(previo['modelo'])
+                    modelo.update(nuevos)
+                    return modelo, _registro(modelo, y, m, previo['sigma_base']), 'actualizado'
+            else:
+                modelo = ARIMA(**{**previo['modelo'].get_params(), 'start_params': previo['params']}).fit(y)
+                if _sigma(modelo) <= umbral * previo['sigma_base']:
+                    return modelo, _registro(modelo, y, m, previo['sigma_base']), 'reajustado'
+            accion = 'deriva'
+
+        modelo = auto_arima(y, m=m, **parametros)
+    return modelo, _registro(modelo, y, m, _sigma(modelo)), accion
+
+
+class RegistroModelos:
+    """
+    registro de modelos sarima por serie: ordenes, parametros, modelo ajustado y la
+    huella de los datos con que se ajusto. se guarda en un pickle (ruta) para que la
+    siguiente ejecucion solo haga la busqueda completa en las series que lo necesitan
+    """
+    def __init__(self, ruta=None):
+        self.ruta = ruta
+        self.registros = {}
+        self.acciones = dict.fromkeys(ACCIONES, 0)
+        if ruta and os.path.exists(ruta):
+            with open(ruta, "rb") as archivo:
+                self.registros = pickle.load(archivo)
+
+    def previo(self, serie_id):
+        return self.registros.get(serie_id)
+
+    def actualizar(self, serie_id, registro, accion):
+        self.registros[serie_id] = registro
+        self.acciones[accion] += 1
+
+    def ajustar(self, serie_id, y, m, parametros, umbral=2.0):
+        """
+        ajustar_con_registro con el registro previo de serie_id, guardando el nuevo
+        """
+        modelo, registro, accion = ajustar_con_registro(y, m, parametros, self.previo(serie_id), umbral)
+        self.actualizar(serie_id, registro, accion)
+        return modelo
+
+    def guardar(self):
+        if not self.ruta:
+            return
+        os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+        with open(self.ruta + ".tmp", "wb") as archivo:
+            pickle.dump(self.registros, archivo, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(self.ruta + ".tmp", self.ruta)
+
+    def resumen(self):
+        print("Registro: " + ", ".join(f"{n} {accion}" for accion, n in self.acciones.items() if n))
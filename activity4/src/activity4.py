@@ -1,7 +1,11 @@
 import pandas as pd
-import math
+import numpy as np
 import networkx as nx
 import folium
+import math
+import heapq
+from itertools import count
+from concurrent.futures import ProcessPoolExecutor
 
 def cargar_y_limpiar_datos(path="../data/"):
     cols_airports = ["airport_id", "name", "city", "country", "IATA", "ICAO",
@@ -33,101 +37,353 @@ def cargar_y_limpiar_datos(path="../data/"):
 
     return df_airports, df_routes
 
-def calcular_haversine(lat1, lon1, lat2, lon2):
+def calcular_haversine_vectorizado(lat1, lon1, lat2, lon2):
     """
-    calculando la distancia en km entre dos puntos
+    calculando la distancia en km entre arreglos de puntos en una sola
+    operacion de numpy (acepta escalares o arreglos del mismo tamaño)
     """
     # radio de la tierra en km
     r = 6371.0
     # convirtiendo coordenadas a radianes
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
+    lat1_rad = np.radians(lat1)
+    lon1_rad = np.radians(lon1)
+    lat2_rad = np.radians(lat2)
+    lon2_rad = np.radians(lon2)
 
     # diferencias
     dlon = lon2_rad - lon1_rad
     dlat = lat2_rad - lat1_rad
 
     # haversine formula
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    a = np.sin(dlat/2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1-a))
 
     distancia = r * c
     return distancia
 
-def construir_grafo_con_pesos(df_airports, df_routes):
+def calcular_haversine(lat1, lon1, lat2, lon2):
     """
-    construyendo el grafo asignando la distancia de haversine como peso
-    a las aristas
+    calculando la distancia en km entre dos puntos
     """
-    print("Construyendo grafo con pesos en las aristas...")
-    G = nx.DiGraph()
+    return float(calcular_haversine_vectorizado(lat1, lon1, lat2, lon2))
 
-    # agregando nodos
-    for airport_id, row in df_airports.iterrows():
-        G.add_node(
-            airport_id,
-            name=row['name'],
-            iata=row['IATA'],
-            lat=row['latitude'],
-            lon=row['longitude']
-        )
+def _normalizar_codigo(codigo):
+    """
+    normalizando un codigo IATA/ICAO para el indice (sin espacios y en mayusculas)
+    """
+    if not isinstance(codigo, str):
+        return None
+    codigo = codigo.strip().upper()
+    return codigo or None
+
+class GrafoVuelos(nx.DiGraph):
+    """
+    DiGraph de networkx que mantiene un indice persistente codigo -> airport_id
+    (IATA e ICAO, sin distinguir mayusculas) sincronizado al agregar o eliminar nodos.
+    Si un codigo se repite gana el primer aeropuerto y el resto queda reportado
+    en codigos_duplicados.
+    """
+    def __init__(self, incoming_graph_data=None, **attr):
+        self.indice_codigos = {}
+        self.codigos_duplicados = {}
+        self._codigos_por_nodo = {}
+        super().__init__(incoming_graph_data, **attr)
+
+    def _indexar_nodo(self, nodo):
+        # si el nodo ya existia quitamos sus codigos anteriores
+        self._desindexar_nodo(nodo)
+        atributos = self._node[nodo]
+        codigos = {_normalizar_codigo(atributos.get(campo)) for campo in ('iata', 'icao')}
+        codigos.discard(None)
+        for codigo in codigos:
+            dueno = self.indice_codigos.setdefault(codigo, nodo)
+            if dueno != nodo:
+                self.codigos_duplicados.setdefault(codigo, [dueno]).append(nodo)
+        self._codigos_por_nodo[nodo] = codigos
+
+    def _desindexar_nodo(self, nodo):
+        for codigo in self._codigos_por_nodo.pop(nodo, ()):
+            duplicados = self.codigos_duplicados.get(codigo)
+            if duplicados:
+                duplicados.remove(nodo)
+                # promovemos al siguiente aeropuerto con el mismo codigo
+                self.indice_codigos[codigo] = duplicados[0]
+                if len(duplicados) == 1:
+                    del self.codigos_duplicados[codigo]
+            elif self.indice_codigos.get(codigo) == nodo:
+                del self.indice_codigos[codigo]
+
+    def add_node(self, node_for_adding, **attr):
+        super().add_node(node_for_adding, **attr)
+        self._indexar_nodo(node_for_adding)
 
+    def add_nodes_from(self, nodes_for_adding, **attr):
+        nodos = list(nodes_for_adding)
+        super().add_nodes_from(nodos, **attr)
+        for n in nodos:
+            try:
+                # los nodos con atributos llegan como tuplas (nodo, dict) no hasheables
+                nodo = n if n in self._node else n[0]
+            except TypeError:
+                nodo = n[0]
+            self._indexar_nodo(nodo)
+
+    def remove_node(self, n):
+        super().remove_node(n)
+        self._desindexar_nodo(n)
+
+    def remove_nodes_from(self, nodes):
+        nodos = list(nodes)
+        super().remove_nodes_from(nodos)
+        for n in nodos:
+            self._desindexar_nodo(n)
+
+    def clear(self):
+        super().clear()
+        self.indice_codigos.clear()
+        self.codigos_duplicados.clear()
+        self._codigos_por_nodo.clear()
+
+def calcular_aristas(df_airports, df_routes):
+    """
+    calculando las aristas validas (ambos aeropuertos existen) con su distancia
+    haversine como arreglos de numpy: origen, destino, distancia y stops
+    """
     # validando la integridad de las rutas
-    nodos_validos = set(G.nodes)
     rutas_seguras = df_routes[
-        df_routes['source_airport_id'].isin(nodos_validos) &
-        df_routes['dest_airport_id'].isin(nodos_validos)
+        df_routes['source_airport_id'].isin(df_airports.index) &
+        df_routes['dest_airport_id'].isin(df_airports.index)
     ]
+    origenes = rutas_seguras['source_airport_id'].to_numpy(dtype=np.int64)
+    destinos = rutas_seguras['dest_airport_id'].to_numpy(dtype=np.int64)
 
-    # agregando aristas con pesos
-    dict_coords = df_airports[['latitude', 'longitude']].to_dict('index')
-    
-    aristas_con_atributos = []
+    # extrayendo las coordenadas de todas las rutas de una sola vez
+    lat = df_airports['latitude'].to_numpy(dtype=float)
+    lon = df_airports['longitude'].to_numpy(dtype=float)
+    pos_orig = df_airports.index.get_indexer(origenes)
+    pos_dest = df_airports.index.get_indexer(destinos)
+
+    # calculando el costo de todas las rutas en una sola operacion
+    distancias_km = calcular_haversine_vectorizado(lat[pos_orig], lon[pos_orig], lat[pos_dest], lon[pos_dest])
+
+    return {
+        'origen': origenes,
+        'destino': destinos,
+        'distancia': distancias_km,
+        'stops': rutas_seguras['stops'].to_numpy()
+    }
 
-    for row in rutas_seguras.itertuples():
-        origen = row.source_airport_id
-        destino = row.dest_airport_id
+def construir_grafo_con_pesos(df_airports, df_routes, aristas=None):
+    """
+    construyendo el grafo asignando la distancia de haversine como peso
+    a las aristas. si ya se tienen las aristas calculadas (por ejemplo de la
+    cache en disco) se pasan en aristas y no se recalculan
+    """
+    print("Construyendo grafo con pesos en las aristas...")
+    G = GrafoVuelos()
 
-        # extrayendo coordenadas del diccionario
-        lat_orig = dict_coords[origen]['latitude']
-        lon_orig = dict_coords[origen]['longitude']
-        lat_dest = dict_coords[destino]['latitude']
-        lon_dest = dict_coords[destino]['longitude']
+    # agregando nodos
+    G.add_nodes_from(
+        (airport_id, {'name': name, 'iata': iata, 'icao': icao, 'lat': lat, 'lon': lon})
+        for airport_id, name, iata, icao, lat, lon in zip(
+            df_airports.index,
+            df_airports['name'],
+            df_airports['IATA'],
+            df_airports['ICAO'],
+            df_airports['latitude'],
+            df_airports['longitude']
+        )
+    )
 
-        # calculando el costo de la ruta
-        distancia_km = calcular_haversine(lat_orig, lon_orig, lat_dest, lon_dest)
-        # guardando la arista con los atributos distancia y paradas
-        aristas_con_atributos.append((origen, destino, {'distancia': distancia_km, 'stops': row.stops}))
+    if aristas is None:
+        aristas = calcular_aristas(df_airports, df_routes)
 
-    G.add_edges_from(aristas_con_atributos)
+    # guardando las aristas con los atributos distancia y paradas
+    G.add_edges_from(
+        (origen, destino, {'distancia': distancia_km, 'stops': stops})
+        for origen, destino, distancia_km, stops in zip(
+            aristas['origen'].tolist(), aristas['destino'].tolist(),
+            aristas['distancia'].tolist(), aristas['stops'].tolist()
+        )
+    )
+    if G.codigos_duplicados:
+        print(f"Aviso: {len(G.codigos_duplicados)} codigos IATA/ICAO repetidos, se usa el primer aeropuerto de cada uno")
     print(f"Grafo finalizado: {G.number_of_nodes()} nodos y {G.number_of_edges()} aristas con peso")
     return G
 
 def obtener_id_por_iata(G, codigo_iata):
      """
-     buscando el codigo de 3 letras IATA de cada aeropuerto
+     buscando el airport_id por su codigo IATA (o ICAO) en el indice del grafo
      """
+     indice = getattr(G, 'indice_codigos', None)
+     if indice is not None:
+          return indice.get(_normalizar_codigo(codigo_iata))
+     # grafos sin indice (nx.DiGraph simple): recorrido lineal
      for nodo, atributos in G.nodes(data=True):
           if atributos.get('iata') == codigo_iata:
                return nodo
      return None
 
-def buscar_mejor_ruta(G, iata_origen, iata_destino, optimizar_por=None):
+ESTRATEGIAS = ('dijkstra', 'astar', 'bidireccional', 'alt')
+
+def _peso_arista(weight):
+    # sin weight cada vuelo cuenta como un tramo (menos escalas)
+    if weight is None:
+        return lambda atributos: 1
+    return lambda atributos: atributos[weight]
+
+def cota_gran_circulo(G, destino):
+    """
+    heuristica admisible para A*: distancia de gran circulo de cada aeropuerto
+    al destino. como los pesos son haversine, volar con escalas nunca es mas corto
+    """
+    r = 6371.0
+    lat_d = math.radians(G.nodes[destino]['lat'])
+    lon_d = math.radians(G.nodes[destino]['lon'])
+    cos_lat_d = math.cos(lat_d)
+    nodos = G.nodes
+    cache = {}
+
+    def heuristica(nodo):
+        if nodo not in cache:
+            lat = math.radians(nodos[nodo]['lat'])
+            lon = math.radians(nodos[nodo]['lon'])
+            a = math.sin((lat_d - lat)/2)**2 + math.cos(lat) * cos_lat_d * math.sin((lon_d - lon)/2)**2
+            cache[nodo] = 2 * r * math.atan2(math.sqrt(a), math.sqrt(1-a))
+        return cache[nodo]
+    return heuristica
+
+def _reconstruir_camino(padres, nodo):
+    camino = []
+    while nodo is not None:
+        camino.append(nodo)
+        nodo = padres[nodo]
+    return camino[::-1]
+
+def _astar(G, origen, destino, weight, heuristica=None):
+    """
+    A* con contador de nodos expandidos (sin heuristica es Dijkstra)
+    """
+    peso = _peso_arista(weight)
+    if heuristica is None:
+        heuristica = lambda nodo: 0.0
+    desempate = count()
+    abiertos = [(heuristica(origen), next(desempate), origen, 0.0)]
+    costos = {origen: 0.0}
+    padres = {origen: None}
+    cerrados = set()
+    expandidos = 0
+
+    while abiertos:
+        _, _, nodo, costo = heapq.heappop(abiertos)
+        if nodo in cerrados:
+            continue
+        cerrados.add(nodo)
+        expandidos += 1
+        if nodo == destino:
+            return _reconstruir_camino(padres, destino), expandidos
+
+        for vecino, atributos in G.succ[nodo].items():
+            nuevo = costo + peso(atributos)
+            if nuevo < costos.get(vecino, math.inf):
+                costos[vecino] = nuevo
+                padres[vecino] = nodo
+                heapq.heappush(abiertos, (nuevo + heuristica(vecino), next(desempate), vecino, nuevo))
+
+    raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+
+def _bidireccional(G, origen, destino, weight):
+    """
+    Dijkstra bidireccional: avanza desde el origen (sucesores) y desde el destino
+    (predecesores) hasta que ambas fronteras ya no pueden mejorar el mejor encuentro
+    """
+    if origen == destino:
+        return [origen], 0
+    peso = _peso_arista(weight)
+    desempate = count()
+    adyacencias = (G.succ, G.pred)
+    costos = ({origen: 0.0}, {destino: 0.0})
+    padres = ({origen: None}, {destino: None})
+    cerrados = (set(), set())
+    colas = ([(0.0, next(desempate), origen)], [(0.0, next(desempate), destino)])
+    mejor = math.inf
+    encuentro = None
+    expandidos = 0
+
+    while colas[0] and colas[1]:
+        if colas[0][0][0] + colas[1][0][0] >= mejor:
+            break
+        # avanzamos el lado cuya frontera esta mas cerca
+        lado = 0 if colas[0][0][0] <= colas[1][0][0] else 1
+        otro = 1 - lado
+        costo, _, nodo = heapq.heappop(colas[lado])
+        if nodo in cerrados[lado]:
+            continue
+        cerrados[lado].add(nodo)
+        expandidos += 1
+
+        for vecino, atributos in adyacencias[lado][nodo].items():
+            nuevo = costo + peso(atributos)
+            if nuevo < costos[lado].get(vecino, math.inf):
+                costos[lado][vecino] = nuevo
+                padres[lado][vecino] = nodo
+                heapq.heappush(colas[lado], (nuevo, next(desempate), vecino))
+            if vecino in costos[otro]:
+                total = costos[lado][vecino] + costos[otro][vecino]
+                if total < mejor:
+                    mejor = total
+                    encuentro = vecino
+
+    if encuentro is None:
+        raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+    ida = _reconstruir_camino(padres[0], encuentro)
+    vuelta = _reconstruir_camino(padres[1], encuentro)[::-1]
+    return ida + vuelta[1:], expandidos
+
+def buscar_camino(G, id_origen, id_destino, optimizar_por=None, estrategia='dijkstra', indice_alt=None):
+    """
+    camino mas corto con la estrategia elegida, sin imprimir nada:
+        - dijkstra: expande en todas direcciones
+        - astar: guiado por la distancia de gran circulo al destino (con optimizar_por='distancia')
+        - bidireccional: dijkstra desde origen y destino al mismo tiempo
+        - alt: A* con las cotas de landmarks de indice_alt (indice_alt.py)
+    regresa (ruta_ids, nodos_expandidos)
+    """
+    if estrategia not in ESTRATEGIAS:
+        raise ValueError(f"estrategia desconocida: {estrategia}. Opciones: {ESTRATEGIAS}")
+    if estrategia == 'bidireccional':
+        return _bidireccional(G, id_origen, id_destino, optimizar_por)
+    heuristica = None
+    if estrategia == 'alt' and indice_alt is None:
+        raise ValueError("la estrategia 'alt' necesita un indice_alt (ver indice_alt.cargar_o_construir_indice)")
+    if estrategia == 'astar' and optimizar_por == 'distancia':
+        heuristica = cota_gran_circulo(G, id_destino)
+    elif estrategia == 'alt' and optimizar_por == 'distancia':
+        # el indice trae su propia adyacencia compacta y resuelve sin networkx
+        return indice_alt.camino(id_origen, id_destino)
+    return _astar(G, id_origen, id_destino, optimizar_por, heuristica)
+
+def buscar_mejor_ruta(G, iata_origen, iata_destino, optimizar_por=None, estrategia=None, indice_alt=None):
      """
-     buscando el camino mas corto mediante Dijkstra
+     buscando el camino mas corto mediante Dijkstra (acepta GrafoVuelos o GrafoCSR).
+     con estrategia ('dijkstra', 'astar', 'bidireccional' o 'alt') se usa buscar_camino
      """
      print(f"Buscando ruta mas corta de: {iata_origen} -> {iata_destino}...")
      id_origen = obtener_id_por_iata(G, iata_origen)
      id_destino = obtener_id_por_iata(G, iata_destino)
 
-     if not id_origen or not id_destino:
+     if id_origen is None or id_destino is None:
           print("Error !. el codigo IATA de origen o destino no se encontro")
           return None
      try:
         # weight dicta si evaluamos escalas o kilometros
-        ruta_ids = nx.shortest_path(G, source=id_origen, target=id_destino, weight=optimizar_por)
+        if estrategia is not None:
+            ruta_ids, _ = buscar_camino(G, id_origen, id_destino, optimizar_por, estrategia, indice_alt)
+        elif isinstance(G, nx.Graph):
+            ruta_ids = nx.shortest_path(G, source=id_origen, target=id_destino, weight=optimizar_por)
+        else:
+            # GrafoCSR (grafo_csr.py) resuelve con sus propios arreglos
+            ruta_ids = G.camino_mas_corto(id_origen, id_destino, weight=optimizar_por)
 
         print(f"Criterio de optimizacion: {'Menos escalas' if optimizar_por is None else 'Menos km'}")
         print("Itinerario de vuelo: ")
@@ -151,6 +407,76 @@ def buscar_mejor_ruta(G, iata_origen, iata_destino, optimizar_por=None):
         print("No existe una ruta de vuelos comerciales que conecte estos aeropuertos :'(")
 
 
+# grafo compartido por cada proceso del pool (se envia una sola vez por proceso)
+_GRAFO_TRABAJADOR = None
+
+def _iniciar_trabajador(G):
+    global _GRAFO_TRABAJADOR
+    _GRAFO_TRABAJADOR = G
+
+def _rutas_desde_origen(G, id_origen, ids_destino, optimizar_por):
+    """
+    una sola busqueda desde el origen y extraccion de la ruta a cada destino
+    """
+    if isinstance(G, nx.Graph):
+        if optimizar_por is None:
+            caminos = nx.single_source_shortest_path(G, id_origen)
+        else:
+            _, caminos = nx.single_source_dijkstra(G, id_origen, weight=optimizar_por)
+        rutas = [caminos.get(id_destino) for id_destino in ids_destino]
+    else:
+        rutas = G.caminos_desde(id_origen, ids_destino, weight=optimizar_por)
+
+    resultados = []
+    for ruta in rutas:
+        if ruta is None:
+            resultados.append((np.nan, -1, None))
+        else:
+            distancia = sum(G[u][v]['distancia'] for u, v in zip(ruta, ruta[1:]))
+            resultados.append((distancia, len(ruta) - 1, ruta))
+    return resultados
+
+def _trabajo_origen(argumentos):
+    return _rutas_desde_origen(_GRAFO_TRABAJADOR, *argumentos)
+
+def matriz_de_rutas(G, iatas_origen, iatas_destino, optimizar_por=None, procesos=None):
+    """
+    calculando las rutas de todos los origenes a todos los destinos sin imprimir nada.
+    se hace una sola busqueda por origen; con procesos > 1 los origenes se reparten
+    en un pool de procesos. regresa un df con una fila por par (origen, destino):
+        - distancia_km: km totales de la ruta (NaN si no hay ruta)
+        - escalas: numero de tramos de la ruta (-1 si no hay ruta)
+        - ruta: lista de airport_id (None si no hay ruta)
+    """
+    ids_origen = [obtener_id_por_iata(G, codigo) for codigo in iatas_origen]
+    ids_destino = [obtener_id_por_iata(G, codigo) for codigo in iatas_destino]
+    destinos_validos = [id_destino for id_destino in ids_destino if id_destino is not None]
+    trabajos = [(id_origen, destinos_validos, optimizar_por) for id_origen in ids_origen if id_origen is not None]
+
+    if procesos and procesos > 1:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_iniciar_trabajador, initargs=(G,)) as pool:
+            por_origen = list(pool.map(_trabajo_origen, trabajos, chunksize=max(1, len(trabajos) // (procesos * 4))))
+    else:
+        por_origen = [_rutas_desde_origen(G, *trabajo) for trabajo in trabajos]
+
+    # codigos no encontrados quedan como pares sin ruta
+    sin_ruta = (np.nan, -1, None)
+    resultados_origen = iter(por_origen)
+    filas = []
+    for iata_origen, id_origen in zip(iatas_origen, ids_origen):
+        resultados = iter(next(resultados_origen)) if id_origen is not None else None
+        for iata_destino, id_destino in zip(iatas_destino, ids_destino):
+            if resultados is None or id_destino is None:
+                distancia, escalas, ruta = sin_ruta
+            else:
+                distancia, escalas, ruta = next(resultados)
+            filas.append((iata_origen, iata_destino, id_origen, id_destino, distancia, escalas, ruta))
+
+    df_rutas = pd.DataFrame(filas, columns=['origen', 'destino', 'id_origen', 'id_destino',
+                                            'distancia_km', 'escalas', 'ruta'])
+    df_rutas[['id_origen', 'id_destino']] = df_rutas[['id_origen', 'id_destino']].astype('Int64')
+    return df_rutas
+
 def visualizar_ruta_mapa(G, ruta_ids, nombre_archivo="../plots/ruta_vuelo.html"):
     """
     toma una lista de rutas o nodos, extrae sus coordenadas y genera un mapa HTML interactivo con la ruta trazada
@@ -197,8 +523,11 @@ def visualizar_ruta_mapa(G, ruta_ids, nombre_archivo="../plots/ruta_vuelo.html")
     print(f"mapa guardado exitosamente!")
 
 if __name__ == "__main__":
-        df_airports, df_routes = cargar_y_limpiar_datos()
-        grafo_vuelos = construir_grafo_con_pesos(df_airports, df_routes)
+        from cache_datos import cargar_grafo_con_cache
+
+        # la cache se invalida sola si cambian airports.dat o routes.dat; el grafo es un
+        # GrafoCSR sobre los arreglos mapeados de la cache (a_networkx() si hace falta networkx)
+        df_airports, df_routes, grafo_vuelos = cargar_grafo_con_cache()
         print(f"Total de aeropuertos (Nodos): {grafo_vuelos.number_of_nodes()}")
         print(f"Total de rutas validas (Aristas): {grafo_vuelos.number_of_edges()}")
 
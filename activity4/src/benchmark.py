@@ -0,0 +1,319 @@
+import os
+import time
+import shutil
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+import networkx as nx
+from scipy.spatial import cKDTree
+
+from activity4 import (calcular_haversine, calcular_haversine_vectorizado, cargar_y_limpiar_datos, calcular_aristas,
+                       construir_grafo_con_pesos, buscar_mejor_ruta, buscar_camino,
+                       obtener_id_por_iata, ESTRATEGIAS)
+from grafo_csr import GrafoCSR, construir_grafo_csr
+from indice_alt import IndiceALT
+from cache_datos import cargar_datos_con_cache, cargar_grafo_con_cache
+from ingesta_rutas import ingerir_rutas_por_bloques
+
+
+def generar_coordenadas(n, semilla=42):
+    """
+    generando n pares de coordenadas aleatorias (origen, destino) en todo el globo
+    """
+    rng = np.random.default_rng(semilla)
+    lat1 = rng.uniform(-90, 90, n)
+    lon1 = rng.uniform(-180, 180, n)
+    lat2 = rng.uniform(-90, 90, n)
+    lon2 = rng.uniform(-180, 180, n)
+    return lat1, lon1, lat2, lon2
+
+def benchmark_haversine(tamanios=(10_000, 100_000, 1_000_000)):
+    """
+    comparando el ciclo escalar contra la version vectorizada de haversine
+    """
+    print("Benchmark haversine: escalar vs vectorizado")
+    print(f"{'aristas':>10} | {'escalar (s)':>12} | {'vectorizado (s)':>16} | {'speedup':>8}")
+    for n in tamanios:
+        lat1, lon1, lat2, lon2 = generar_coordenadas(n)
+
+        # camino escalar (como el ciclo original con itertuples)
+        inicio = time.perf_counter()
+        escalar = [
+            calcular_haversine(a, b, c, d)
+            for a, b, c, d in zip(lat1.tolist(), lon1.tolist(), lat2.tolist(), lon2.tolist())
+        ]
+        t_escalar = time.perf_counter() - inicio
+
+        # camino vectorizado
+        inicio = time.perf_counter()
+        vectorizado = calcular_haversine_vectorizado(lat1, lon1, lat2, lon2)
+        t_vectorizado = time.perf_counter() - inicio
+
+        # ambos caminos deben dar la misma distancia
+        assert np.allclose(escalar, vectorizado)
+        print(f"{n:>10} | {t_escalar:>12.4f} | {t_vectorizado:>16.4f} | {t_escalar / t_vectorizado:>7.1f}x")
+
+def generar_red_sintetica(n_aeropuertos=7_000, n_rutas=67_000, semilla=42):
+    """
+    generando df_airports y df_routes con la misma forma que cargar_y_limpiar_datos
+    """
+    rng = np.random.default_rng(semilla)
+    ids = np.arange(1, n_aeropuertos + 1)
+    letras = np.array(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    codigos = ["".join(c) for c in letras[rng.integers(0, 26, (n_aeropuertos, 3))]]
+    df_airports = pd.DataFrame({
+        'name': [f"Aeropuerto {i}" for i in ids],
+        'IATA': codigos,
+        'ICAO': ["X" + c for c in codigos],
+        'latitude': rng.uniform(-60, 70, n_aeropuertos),
+        'longitude': rng.uniform(-180, 180, n_aeropuertos),
+    }, index=pd.Index(ids, name='airport_id'))
+    df_routes = pd.DataFrame({
+        'source_airport_id': rng.choice(ids, n_rutas),
+        'dest_airport_id': rng.choice(ids, n_rutas),
+        'stops': np.zeros(n_rutas, dtype=int),
+    })
+    return df_airports, df_routes
+
+def medir(funcion, *args, **kwargs):
+    """
+    ejecutando funcion y regresando (resultado, segundos, pico de memoria en MB)
+    """
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    resultado = funcion(*args, **kwargs)
+    segundos = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, segundos, pico / 1e6
+
+def benchmark_grafo_csr(tamanios=((7_000, 67_000), (20_000, 500_000))):
+    """
+    comparando construccion, memoria y consultas entre networkx y GrafoCSR
+    """
+    print("Benchmark grafo: networkx.DiGraph vs GrafoCSR")
+    for n_aeropuertos, n_rutas in tamanios:
+        df_airports, df_routes = generar_red_sintetica(n_aeropuertos, n_rutas)
+        G_nx, t_nx, mem_nx = medir(construir_grafo_con_pesos, df_airports, df_routes)
+        G_csr, t_csr, mem_csr = medir(construir_grafo_csr, df_airports, df_routes)
+
+        origen, destino = df_airports['IATA'].iloc[0], df_airports['IATA'].iloc[-1]
+        _, q_nx, _ = medir(buscar_mejor_ruta, G_nx, origen, destino, optimizar_por='distancia')
+        _, q_csr, _ = medir(buscar_mejor_ruta, G_csr, origen, destino, optimizar_por='distancia')
+
+        print(f"{n_aeropuertos} aeropuertos / {n_rutas} rutas")
+        print(f"  networkx: construccion {t_nx:.3f}s | memoria {mem_nx:.1f} MB | consulta {q_nx * 1000:.1f} ms")
+        print(f"  GrafoCSR: construccion {t_csr:.3f}s | memoria {mem_csr:.1f} MB | consulta {q_csr * 1000:.1f} ms")
+
+# aeropuertos reales que se agregan a la red sintetica para tener pares intercontinentales
+AEROPUERTOS_REFERENCIA = {
+    'BJX': (20.9935, -101.4808), 'MEX': (19.4363, -99.0721), 'NRT': (35.7647, 140.3864),
+    'JFK': (40.6398, -73.7789), 'LHR': (51.4706, -0.4619), 'CDG': (49.0128, 2.5500),
+    'SYD': (-33.9461, 151.1772), 'GRU': (-23.4356, -46.4731), 'JNB': (-26.1392, 28.2460),
+}
+PARES_INTERCONTINENTALES = [('BJX', 'NRT'), ('MEX', 'SYD'), ('JFK', 'JNB'), ('GRU', 'LHR'), ('CDG', 'BJX')]
+
+def generar_red_geografica(n_aeropuertos=7_000, vecinos=8, n_largas=5_000, semilla=42):
+    """
+    red sintetica con rutas sobre todo regionales (k vecinos mas cercanos) y algunas
+    rutas largas, parecida a la estructura de routes.dat
+    """
+    df_airports, _ = generar_red_sintetica(n_aeropuertos, 0, semilla)
+    for i, (codigo, (lat, lon)) in enumerate(AEROPUERTOS_REFERENCIA.items()):
+        df_airports.iloc[i, df_airports.columns.get_indexer(['IATA', 'ICAO', 'latitude', 'longitude'])] = [codigo, "X" + codigo, lat, lon]
+    # eliminando los codigos aleatorios que choquen con los de referencia
+    repetidos = df_airports['IATA'].isin(list(AEROPUERTOS_REFERENCIA)) & (np.arange(len(df_airports)) >= len(AEROPUERTOS_REFERENCIA))
+    df_airports.loc[repetidos, ['IATA', 'ICAO']] = None
+
+    # vecinos mas cercanos sobre la esfera unitaria (x, y, z)
+    lat = np.radians(df_airports['latitude'].to_numpy())
+    lon = np.radians(df_airports['longitude'].to_numpy())
+    xyz = np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+    _, cercanos = cKDTree(xyz).query(xyz, k=vecinos + 1)
+    ids = df_airports.index.to_numpy()
+    origenes = np.repeat(ids, vecinos)
+    destinos = ids[cercanos[:, 1:].ravel()]
+
+    rng = np.random.default_rng(semilla)
+    origenes = np.concatenate([origenes, destinos, rng.choice(ids, n_largas)])
+    destinos = np.concatenate([destinos, np.repeat(ids, vecinos), rng.choice(ids, n_largas)])
+    df_routes = pd.DataFrame({'source_airport_id': origenes, 'dest_airport_id': destinos, 'stops': 0})
+    return df_airports, df_routes
+
+def cargar_red_benchmark(path="../data/"):
+    """
+    usando los datos reales de OpenFlights si existen, si no la red geografica sintetica
+    """
+    if os.path.exists(f"{path}airports.dat") and os.path.exists(f"{path}routes.dat"):
+        return cargar_y_limpiar_datos(path)
+    print("No se encontraron airports.dat/routes.dat, usando red sintetica")
+    return generar_red_geografica()
+
+def benchmark_estrategias(G, G_csr, pares=PARES_INTERCONTINENTALES, repeticiones=5, n_landmarks=16):
+    """
+    comparando nodos expandidos y latencia de dijkstra, A*, bidireccional y ALT (menos km).
+    el indice ALT se construye una vez antes de las consultas; la aceleracion es contra
+    GrafoCSR.caminos_desde (dijkstra de scipy sobre la misma red en arreglos)
+    """
+    print("Benchmark estrategias de busqueda (optimizar_por='distancia')")
+    inicio = time.perf_counter()
+    indice_alt = IndiceALT.construir(G, n_landmarks=n_landmarks)
+    print(f"  indice ALT de {n_landmarks} landmarks construido en {time.perf_counter() - inicio:.2f}s")
+    print(f"{'par':>10} | {'estrategia':>13} | {'expandidos':>10} | {'latencia (ms)':>13} | {'km':>9} | {'vs csr':>7}")
+    for iata_origen, iata_destino in pares:
+        id_origen = obtener_id_por_iata(G, iata_origen)
+        id_destino = obtener_id_por_iata(G, iata_destino)
+        if id_origen is None or id_destino is None:
+            continue
+
+        # referencia: el dijkstra de scipy de GrafoCSR
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            ruta = G_csr.caminos_desde(id_origen, [id_destino], weight='distancia')[0]
+        latencia_csr = (time.perf_counter() - inicio) / repeticiones * 1000
+        km = nx.path_weight(G, ruta, 'distancia')
+        print(f"{iata_origen + '-' + iata_destino:>10} | {'GrafoCSR':>13} | {'-':>10} | {latencia_csr:>13.2f} | {km:>9.1f} | {'-':>7}")
+
+        for estrategia in ESTRATEGIAS:
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                ruta, expandidos = buscar_camino(G, id_origen, id_destino, 'distancia', estrategia,
+                                                 indice_alt=indice_alt if estrategia == 'alt' else None)
+            latencia = (time.perf_counter() - inicio) / repeticiones * 1000
+            km = nx.path_weight(G, ruta, 'distancia')
+            print(f"{'':>10} | {estrategia:>13} | {expandidos:>10} | {latencia:>13.2f} | {km:>9.1f} | "
+                  f"{latencia_csr / latencia:>6.1f}x")
+
+def benchmark_indice_alt(G, G_csr, n_landmarks=(8, 16, 32), n_consultas=300, ruta="indice_alt_benchmark.npz", semilla=7):
+    """
+    midiendo construccion, guardado/carga y aceleracion de las consultas con el indice ALT
+    contra GrafoCSR.caminos_desde, el A* de gran circulo y el dijkstra de networkx, en
+    pares aleatorios conectados
+    """
+    rng = np.random.default_rng(semilla)
+    nodos = np.array(list(G.nodes))
+    pares = []
+    while len(pares) < n_consultas:
+        origen, destino = rng.choice(nodos, 2, replace=False).tolist()
+        if nx.has_path(G, origen, destino):
+            pares.append((origen, destino))
+
+    def latencia_ms(consulta):
+        inicio = time.perf_counter()
+        for origen, destino in pares:
+            consulta(origen, destino)
+        return (time.perf_counter() - inicio) / len(pares) * 1000
+
+    t_nx = latencia_ms(lambda o, d: nx.shortest_path(G, o, d, weight='distancia'))
+    t_astar = latencia_ms(lambda o, d: buscar_camino(G, o, d, 'distancia', 'astar'))
+    t_csr = latencia_ms(lambda o, d: G_csr.caminos_desde(o, [d], weight='distancia'))
+    print(f"Benchmark indice ALT ({len(pares)} consultas aleatorias)")
+    print(f"  GrafoCSR: {t_csr:.3f} ms/consulta | nx.shortest_path: {t_nx:.3f} ms/consulta | "
+          f"A* gran circulo: {t_astar:.3f} ms/consulta")
+
+    for k in n_landmarks:
+        inicio = time.perf_counter()
+        indice = IndiceALT.construir(G, n_landmarks=k)
+        t_construccion = time.perf_counter() - inicio
+        indice.guardar(ruta)
+        inicio = time.perf_counter()
+        indice = IndiceALT.cargar(ruta, indice.huella)
+        t_carga = time.perf_counter() - inicio
+        tamanio = os.path.getsize(ruta) / 1e6
+        os.remove(ruta)
+
+        expandidos = [indice.camino(o, d)[1] for o, d in pares]
+        t_alt = latencia_ms(indice.camino)
+        print(f"  {k:>2} landmarks: construccion {t_construccion:.2f}s | carga {t_carga:.2f}s | {tamanio:.1f} MB | "
+              f"{t_alt:.3f} ms/consulta | {np.mean(expandidos):.0f} nodos expandidos | "
+              f"{t_csr / t_alt:.1f}x vs GrafoCSR")
+
+def escribir_dat_sinteticos(directorio, df_airports, df_routes):
+    """
+    escribiendo airports.dat y routes.dat con el formato de OpenFlights
+    """
+    aeropuertos = df_airports.reset_index()
+    aeropuertos = aeropuertos.assign(city="Ciudad", country="Pais", altitude=0, timezone=0, DST="U",
+                                     TZ="\\N", type="airport", source="OurAirports")
+    aeropuertos = aeropuertos[["airport_id", "name", "city", "country", "IATA", "ICAO", "latitude",
+                               "longitude", "altitude", "timezone", "DST", "TZ", "type", "source"]]
+    aeropuertos.to_csv(os.path.join(directorio, "airports.dat"), header=False, index=False, na_rep="\\N")
+    rutas = df_routes.assign(airline="XX", airline_id=1, source_airport="AAA", dest_airport="BBB",
+                             codeshare="", equipment="738")
+    rutas = rutas[["airline", "airline_id", "source_airport", "source_airport_id", "dest_airport",
+                   "dest_airport_id", "codeshare", "stops", "equipment"]]
+    rutas.to_csv(os.path.join(directorio, "routes.dat"), header=False, index=False)
+
+def benchmark_cache(path="../data/"):
+    """
+    midiendo el arranque sin cache, en frio (escribe la cache) y en caliente (la lee)
+    """
+    temporal = tempfile.mkdtemp()
+    try:
+        if not os.path.exists(f"{path}airports.dat"):
+            print("No se encontraron airports.dat/routes.dat, usando red sintetica")
+            path = temporal + os.sep
+            escribir_dat_sinteticos(temporal, *generar_red_geografica(n_largas=60_000))
+        cache = os.path.join(temporal, "cache")
+
+        inicio = time.perf_counter()
+        datos = cargar_y_limpiar_datos(path)
+        t_parseo = time.perf_counter() - inicio
+        construir_grafo_con_pesos(*datos)
+        t_sin_cache = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        cargar_grafo_con_cache(path, cache)
+        t_frio = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        cargar_datos_con_cache(path, cache)
+        t_datos_caliente = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        cargar_grafo_con_cache(path, cache)
+        t_caliente = time.perf_counter() - inicio
+
+        print("Benchmark cache de datos y grafo")
+        print(f"  datos: parseo de .dat {t_parseo:.2f}s | cache caliente {t_datos_caliente:.2f}s")
+        print(f"  datos + grafo: sin cache (networkx) {t_sin_cache:.2f}s | frio {t_frio:.2f}s | "
+              f"caliente (GrafoCSR mapeado) {t_caliente:.2f}s")
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+def benchmark_ingesta_por_bloques(tamanios=(1_000_000, 4_000_000), tamanio_bloque=250_000, n_rutas_unicas=50_000):
+    """
+    comparando el pico de memoria de cargar todo routes.dat contra la ingesta por bloques
+    cuando el archivo crece (las rutas distintas se mantienen fijas, como en un historico)
+    """
+    print("Benchmark ingesta por bloques (pico de memoria con tracemalloc)")
+    temporal = tempfile.mkdtemp()
+    try:
+        df_airports, df_rutas_unicas = generar_red_sintetica(3_000, n_rutas_unicas)
+        for n_filas in tamanios:
+            rng = np.random.default_rng(n_filas)
+            df_routes = df_rutas_unicas.iloc[rng.integers(0, n_rutas_unicas, n_filas)]
+            escribir_dat_sinteticos(temporal, df_airports, df_routes)
+            ruta_routes = os.path.join(temporal, "routes.dat")
+            del df_routes
+
+            _, t_completo, mem_completo = medir(lambda: calcular_aristas(*cargar_y_limpiar_datos(temporal + os.sep)))
+            almacen, t_bloques, mem_bloques = medir(ingerir_rutas_por_bloques, ruta_routes, df_airports, tamanio_bloque)
+            print(f"  {n_filas} filas ({os.path.getsize(ruta_routes) / 1e6:.0f} MB): "
+                  f"completo {t_completo:.1f}s / {mem_completo:.0f} MB | "
+                  f"por bloques {t_bloques:.1f}s / {mem_bloques:.0f} MB ({len(almacen.claves)} rutas unicas)")
+    finally:
+        shutil.rmtree(temporal, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    benchmark_haversine()
+    benchmark_grafo_csr()
+    red = cargar_red_benchmark()
+    grafo_vuelos = construir_grafo_con_pesos(*red)
+    grafo_csr = GrafoCSR.desde_dataframes(*red)
+    benchmark_estrategias(grafo_vuelos, grafo_csr)
+    benchmark_indice_alt(grafo_vuelos, grafo_csr)
+    benchmark_cache()
+    benchmark_ingesta_por_bloques()
@@ -0,0 +1,134 @@
+import os
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+from activity4 import cargar_y_limpiar_datos, calcular_aristas
+from grafo_csr import GrafoCSR
+from indice_alt import cargar_o_construir_indice
+
+ARCHIVOS_FUENTE = ("airports.dat", "routes.dat")
+# se incluye en la huella: cambiarla invalida las caches escritas con otro formato
+# (2: el grafo se guarda como arreglos CSR en lugar de un pickle de networkx)
+VERSION_CACHE = "2"
+ARREGLOS_GRAFO = ("offsets", "vecinos", "pesos", "stops")
+
+
+def huella_fuentes(path="../data/"):
+    """
+    sha256 del contenido de airports.dat y routes.dat; si cambian los datos cambia la huella
+    """
+    huella = hashlib.sha256(VERSION_CACHE.encode())
+    for nombre in ARCHIVOS_FUENTE:
+        with open(os.path.join(path, nombre), "rb") as archivo:
+            for bloque in iter(lambda: archivo.read(1 << 20), b""):
+                huella.update(bloque)
+    return huella.hexdigest()
+
+def guardar_cache(directorio, df_airports, df_routes, aristas):
+    """
+    escribiendo los df limpios en parquet y las aristas en .npy
+    """
+    temporal = directorio + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    df_airports.to_parquet(os.path.join(temporal, "airports.parquet"))
+    df_routes.to_parquet(os.path.join(temporal, "routes.parquet"), index=False)
+    for nombre, arreglo in aristas.items():
+        np.save(os.path.join(temporal, f"aristas_{nombre}.npy"), np.ascontiguousarray(arreglo))
+    # el rename deja la cache completa o no la deja, nunca a medias
+    os.replace(temporal, directorio)
+
+def cargar_cache(directorio):
+    """
+    leyendo los parquet y mapeando las aristas en memoria (sin copiarlas ni reparsear)
+    """
+    df_airports = pd.read_parquet(os.path.join(directorio, "airports.parquet"))
+    df_routes = pd.read_parquet(os.path.join(directorio, "routes.parquet"))
+    aristas = {
+        nombre: np.load(os.path.join(directorio, f"aristas_{nombre}.npy"), mmap_mode="r")
+        for nombre in ("origen", "destino", "distancia", "stops")
+    }
+    return df_airports, df_routes, aristas
+
+def directorio_cache_datos(path="../data/", directorio_cache=None):
+    """
+    (directorio de todas las caches, directorio de la cache de la version actual de
+    los .dat). lo que se guarde en el segundo se borra cuando cambian los datos
+    """
+    if directorio_cache is None:
+        directorio_cache = os.path.join(path, "cache")
+    return directorio_cache, os.path.join(directorio_cache, huella_fuentes(path)[:16])
+
+def _cargar_o_crear_cache(path, directorio_cache):
+    directorio_cache, directorio = directorio_cache_datos(path, directorio_cache)
+
+    if os.path.isdir(directorio):
+        print(f"Cargando datos de la cache {directorio}...")
+        return directorio, cargar_cache(directorio)
+
+    print("Cache no encontrada o desactualizada, procesando los .dat...")
+    df_airports, df_routes = cargar_y_limpiar_datos(path)
+    aristas = calcular_aristas(df_airports, df_routes)
+
+    # borrando caches de versiones anteriores de los datos
+    if os.path.isdir(directorio_cache):
+        for anterior in os.listdir(directorio_cache):
+            shutil.rmtree(os.path.join(directorio_cache, anterior), ignore_errors=True)
+    os.makedirs(directorio_cache, exist_ok=True)
+    guardar_cache(directorio, df_airports, df_routes, aristas)
+    return directorio, cargar_cache(directorio)
+
+def cargar_datos_con_cache(path="../data/", directorio_cache=None):
+    """
+    igual que cargar_y_limpiar_datos pero guardando el resultado (y las aristas con
+    su distancia) en una cache identificada por la huella de los .dat. el primer
+    arranque (frio) parsea y escribe la cache; los siguientes (calientes) la leen.
+    regresa df_airports, df_routes y las aristas para construir_grafo_con_pesos
+    """
+    _, datos = _cargar_o_crear_cache(path, directorio_cache)
+    return datos
+
+def guardar_grafo(directorio, G):
+    """
+    escribiendo los arreglos CSR de un GrafoCSR en directorio/grafo (.npy)
+    """
+    ruta = os.path.join(directorio, "grafo")
+    temporal = ruta + ".tmp"
+    shutil.rmtree(temporal, ignore_errors=True)
+    os.makedirs(temporal)
+    for nombre in ARREGLOS_GRAFO:
+        np.save(os.path.join(temporal, f"{nombre}.npy"), np.ascontiguousarray(getattr(G, nombre)))
+    os.replace(temporal, ruta)
+
+def cargar_grafo_con_cache(path="../data/", directorio_cache=None):
+    """
+    ademas de los datos guarda el grafo ya construido en la misma cache, como los
+    arreglos CSR de GrafoCSR: en caliente se mapean en memoria y no se recorre
+    ninguna arista. GrafoCSR sirve para buscar_mejor_ruta, visualizar_ruta_mapa e
+    IndiceALT; para el resto de la API de networkx usar G.a_networkx().
+    regresa df_airports, df_routes y el grafo
+    """
+    directorio, (df_airports, df_routes, aristas) = _cargar_o_crear_cache(path, directorio_cache)
+    ruta_grafo = os.path.join(directorio, "grafo")
+
+    if not os.path.isdir(ruta_grafo):
+        guardar_grafo(directorio, GrafoCSR.desde_aristas(df_airports, aristas))
+    arreglos = {
+        nombre: np.load(os.path.join(ruta_grafo, f"{nombre}.npy"), mmap_mode="r")
+        for nombre in ARREGLOS_GRAFO
+    }
+    return df_airports, df_routes, GrafoCSR.desde_arreglos(df_airports, **arreglos)
+
+def cargar_indice_con_cache(G, path="../data/", directorio_cache=None, n_landmarks=16):
+    """
+    indice ALT de G guardado en la cache de la version actual de los .dat e
+    identificado por la huella de esa cache (sin recorrer las aristas de G).
+    G debe venir de esos mismos datos (cargar_grafo_con_cache)
+    """
+    _, directorio = directorio_cache_datos(path, directorio_cache)
+    if not os.path.isdir(directorio):
+        raise FileNotFoundError(f"No hay cache de datos en {directorio}, cargar antes el grafo con cargar_grafo_con_cache")
+    return cargar_o_construir_indice(G, os.path.join(directorio, "indice_alt.npz"), n_landmarks,
+                                     huella=os.path.basename(directorio))
@@ -0,0 +1,229 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+from activity4 import calcular_aristas, GrafoVuelos, _normalizar_codigo
+
+
+class _VistaNodos:
+    """
+    vista de solo lectura que imita G.nodes[airport_id] de networkx
+    """
+    def __init__(self, grafo):
+        self._grafo = grafo
+
+    def __getitem__(self, airport_id):
+        return self._grafo.datos_nodo(airport_id)
+
+    def __contains__(self, airport_id):
+        return airport_id in self._grafo.posiciones
+
+    def __iter__(self):
+        return iter(self._grafo.ids.tolist())
+
+    def __len__(self):
+        return len(self._grafo.ids)
+
+
+class GrafoCSR:
+    """
+    grafo dirigido de vuelos guardado en arreglos (formato CSR):
+        - offsets: inicio de los vecinos de cada aeropuerto (n_nodos + 1)
+        - vecinos: posicion del aeropuerto destino de cada arista (int32)
+        - pesos: distancia haversine en km de cada arista (float32)
+        - stops: paradas de cada ruta (int8)
+    los aeropuertos se identifican por su airport_id hacia afuera y por su
+    posicion (0..n-1) dentro de los arreglos
+    """
+    def __init__(self, ids, nombres, iata, icao, lat, lon, offsets, vecinos, pesos, stops):
+        self.ids = ids
+        self.nombres = nombres
+        self.iata = iata
+        self.icao = icao
+        self.lat = lat
+        self.lon = lon
+        self.offsets = offsets
+        self.vecinos = vecinos
+        self.pesos = pesos
+        self.stops = stops
+        # airport_id -> posicion con la tabla hash de pandas (sin un dict por nodo)
+        self.posiciones = pd.Index(ids)
+        self.nodes = _VistaNodos(self)
+        self._matrices = {}
+
+        # indice codigo -> airport_id, igual que en GrafoVuelos
+        self.indice_codigos = {}
+        self.codigos_duplicados = {}
+        for airport_id, codigo_iata, codigo_icao in zip(ids.tolist(), iata, icao):
+            for codigo in {_normalizar_codigo(codigo_iata), _normalizar_codigo(codigo_icao)} - {None}:
+                dueno = self.indice_codigos.setdefault(codigo, airport_id)
+                if dueno != airport_id:
+                    self.codigos_duplicados.setdefault(codigo, [dueno]).append(airport_id)
+
+    @classmethod
+    def desde_dataframes(cls, df_airports, df_routes):
+        """
+        construyendo el grafo directamente de los df limpios de cargar_y_limpiar_datos
+        """
+        return cls.desde_aristas(df_airports, calcular_aristas(df_airports, df_routes))
+
+    @classmethod
+    def desde_aristas(cls, df_airports, aristas):
+        """
+        construyendo el grafo de arreglos de aristas (calcular_aristas, la cache de
+        cache_datos o la ingesta por bloques de ingesta_rutas)
+        """
+        ids = df_airports.index.to_numpy(dtype=np.int64)
+        n = len(ids)
+        pos_orig = df_airports.index.get_indexer(aristas['origen']).astype(np.int64)
+        pos_dest = df_airports.index.get_indexer(aristas['destino']).astype(np.int64)
+
+        # rutas repetidas (varias aerolineas): como en networkx se queda la ultima.
+        # np.unique ademas deja las aristas ordenadas por (origen, destino)
+        clave = pos_orig * n + pos_dest
+        _, ultimas = np.unique(clave[::-1], return_index=True)
+        ultimas = len(clave) - 1 - ultimas
+        pos_orig = pos_orig[ultimas]
+        pos_dest = pos_dest[ultimas]
+        pesos = np.asarray(aristas['distancia'])[ultimas].astype(np.float32)
+        stops = pd.to_numeric(pd.Series(np.asarray(aristas['stops'])[ultimas]), errors='coerce').to_numpy()
+
+        offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pos_orig, minlength=n), out=offsets[1:])
+        return cls.desde_arreglos(df_airports, offsets, pos_dest.astype(np.int32), pesos,
+                                  np.nan_to_num(stops, nan=0).astype(np.int8))
+
+    @classmethod
+    def desde_arreglos(cls, df_airports, offsets, vecinos, pesos, stops):
+        """
+        armando el grafo con arreglos CSR ya calculados (por ejemplo los de la cache de
+        cache_datos, mapeados en memoria); los aeropuertos salen de df_airports
+        """
+        return cls(
+            ids=df_airports.index.to_numpy(dtype=np.int64),
+            nombres=df_airports['name'].to_numpy(dtype=object),
+            iata=df_airports['IATA'].to_numpy(dtype=object),
+            icao=df_airports['ICAO'].to_numpy(dtype=object),
+            lat=df_airports['latitude'].to_numpy(dtype=np.float32),
+            lon=df_airports['longitude'].to_numpy(dtype=np.float32),
+            offsets=offsets,
+            vecinos=vecinos,
+            pesos=pesos,
+            stops=stops
+        )
+
+    def number_of_nodes(self):
+        return len(self.ids)
+
+    def number_of_edges(self):
+        return len(self.vecinos)
+
+    def memoria_bytes(self):
+        """
+        memoria de los arreglos numericos del grafo (sin contar los textos)
+        """
+        arreglos = [self.ids, self.lat, self.lon, self.offsets, self.vecinos, self.pesos, self.stops]
+        return sum(a.nbytes for a in arreglos)
+
+    def posicion(self, airport_id):
+        return self.posiciones.get_loc(airport_id)
+
+    def datos_nodo(self, airport_id):
+        """
+        atributos del aeropuerto con las mismas llaves que los nodos de networkx
+        """
+        i = self.posicion(airport_id)
+        return {
+            'name': self.nombres[i],
+            'iata': self.iata[i],
+            'icao': self.icao[i],
+            'lat': float(self.lat[i]),
+            'lon': float(self.lon[i])
+        }
+
+    def __getitem__(self, airport_id):
+        """
+        vecinos de un aeropuerto como G[u] en networkx: {destino: {'distancia', 'stops'}}
+        """
+        i = self.posicion(airport_id)
+        inicio, fin = self.offsets[i], self.offsets[i + 1]
+        return {
+            int(self.ids[v]): {'distancia': float(w), 'stops': int(s)}
+            for v, w, s in zip(self.vecinos[inicio:fin], self.pesos[inicio:fin], self.stops[inicio:fin])
+        }
+
+    def matriz_dispersa(self, weight='distancia'):
+        """
+        matriz de adyacencia de scipy que comparte offsets y vecinos con el grafo.
+        con weight=None cada arista pesa 1 (conteo de escalas)
+        """
+        if weight not in self._matrices:
+            datos = self.pesos if weight == 'distancia' else np.ones(len(self.vecinos), dtype=np.float32)
+            n = len(self.ids)
+            self._matrices[weight] = csr_matrix((datos, self.vecinos, self.offsets), shape=(n, n))
+        return self._matrices[weight]
+
+    def camino_mas_corto(self, origen, destino, weight=None):
+        """
+        camino mas corto entre dos airport_id con el dijkstra de scipy.
+        lanza nx.NetworkXNoPath igual que nx.shortest_path
+        """
+        camino = self.caminos_desde(origen, [destino], weight=weight)[0]
+        if camino is None:
+            raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+        return camino
+
+    def caminos_desde(self, origen, destinos, weight=None):
+        """
+        una sola busqueda desde origen para todos los destinos.
+        regresa una lista de caminos (lista de airport_id o None si no hay ruta)
+        """
+        i_origen = self.posicion(origen)
+        _, predecesores = dijkstra(
+            self.matriz_dispersa(weight), indices=i_origen,
+            unweighted=weight is None, return_predecessors=True
+        )
+        caminos = []
+        for destino in destinos:
+            i_destino = self.posicion(destino)
+            if i_origen != i_destino and predecesores[i_destino] < 0:
+                caminos.append(None)
+                continue
+            camino = [i_destino]
+            while camino[-1] != i_origen:
+                camino.append(predecesores[camino[-1]])
+            caminos.append(self.ids[camino[::-1]].tolist())
+        return caminos
+
+    def a_networkx(self):
+        """
+        convirtiendo a GrafoVuelos de networkx solo cuando se necesita (visualizacion)
+        """
+        G = GrafoVuelos()
+        G.add_nodes_from(
+            (airport_id, {'name': name, 'iata': iata, 'icao': icao, 'lat': lat, 'lon': lon})
+            for airport_id, name, iata, icao, lat, lon in zip(
+                self.ids.tolist(), self.nombres, self.iata, self.icao, self.lat.tolist(), self.lon.tolist()
+            )
+        )
+        origenes = np.repeat(self.ids, np.diff(self.offsets))
+        G.add_edges_from(
+            (origen, destino, {'distancia': distancia, 'stops': stops})
+            for origen, destino, distancia, stops in zip(
+                origenes.tolist(), self.ids[self.vecinos].tolist(), self.pesos.tolist(), self.stops.tolist()
+            )
+        )
+        return G
+
+
+def construir_grafo_csr(df_airports, df_routes):
+    """
+    alternativa compacta a construir_grafo_con_pesos basada en arreglos
+    """
+    print("Construyendo grafo CSR...")
+    G = GrafoCSR.desde_dataframes(df_airports, df_routes)
+    print(f"Grafo CSR finalizado: {G.number_of_nodes()} nodos y {G.number_of_edges()} aristas "
+          f"({G.memoria_bytes() / 1e6:.2f} MB en arreglos)")
+    return G
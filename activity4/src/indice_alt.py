@@ -0,0 +1,213 @@
+import os
+import time
+import math
+import heapq
+import hashlib
+import numpy as np
+import networkx as nx
+from scipy.sparse.csgraph import dijkstra
+
+# distancia "infinita" finita: evita inf - inf en las cotas y sigue descartando
+# los aeropuertos que no pueden llegar al destino
+_SIN_RUTA = 1e9
+
+
+def _huella_csr(nodos, matriz):
+    # sha256 de los arreglos CSR (ids, indptr, indices y pesos con los indices ordenados)
+    huella = hashlib.sha256()
+    for arreglo in (nodos, matriz.indptr, matriz.indices, matriz.data):
+        huella.update(np.ascontiguousarray(arreglo).tobytes())
+    return huella.hexdigest()
+
+def _matriz_csr(G, nodos, weight):
+    if isinstance(G, nx.Graph):
+        matriz = nx.to_scipy_sparse_array(G, nodelist=nodos.tolist(), weight=weight, format='csr')
+    else:
+        # GrafoCSR (grafo_csr.py): ya tiene la matriz, con los aeropuertos en el orden de G.nodes
+        matriz = G.matriz_dispersa(weight).astype(np.float64)
+    matriz.sort_indices()
+    return matriz
+
+def huella_grafo(G, weight='distancia'):
+    """
+    huella del grafo a partir de su matriz de adyacencia CSR: cambia si se agrega,
+    quita o cambia cualquier ruta aunque el numero de aristas sea el mismo.
+    recorre todas las aristas; si el grafo viene de la cache de datos es mas barato
+    usar su huella (ver cache_datos.cargar_indice_con_cache)
+    """
+    nodos = np.array(list(G.nodes), dtype=np.int64)
+    return _huella_csr(nodos, _matriz_csr(G, nodos, weight))
+
+
+class IndiceALT:
+    """
+    indice de landmarks (ALT: A*, Landmarks y desigualdad del Triangulo) sobre el
+    grafo de construir_grafo_con_pesos o un GrafoCSR. para cada landmark L guarda las distancias
+    en km d(L, v) y d(v, L) a todos los aeropuertos, y con ellas da una cota inferior
+    de d(v, t) mucho mas ajustada que la distancia de gran circulo:
+        d(v, t) >= d(L, t) - d(L, v)   y   d(v, t) >= d(v, L) - d(t, L)
+    ademas guarda la adyacencia del grafo en formato CSR para responder las
+    consultas sin pasar por los diccionarios de networkx.
+    es una estrategia opcional (buscar_camino(..., 'alt')): en la red sintetica de 7k
+    aeropuertos responde en 1-1.5 ms por consulta, no por debajo del milisegundo
+    """
+    def __init__(self, nodos, landmarks, desde, hacia, offsets, vecinos, pesos, huella=None):
+        self.huella = huella
+        self.nodos = nodos
+        self.landmarks = landmarks
+        self.desde = desde
+        self.hacia = hacia
+        self.offsets = offsets
+        self.vecinos = vecinos
+        self.pesos = pesos
+        self.posiciones = {nodo: i for i, nodo in enumerate(nodos.tolist())}
+
+        # listas de python por aeropuerto: es lo mas rapido de recorrer dentro de A*
+        vecinos_lista = vecinos.tolist()
+        pesos_lista = pesos.tolist()
+        limites = offsets.tolist()
+        self._adyacencia = [
+            list(zip(vecinos_lista[limites[i]:limites[i + 1]], pesos_lista[limites[i]:limites[i + 1]]))
+            for i in range(len(nodos))
+        ]
+
+    @classmethod
+    def construir(cls, G, n_landmarks=16, weight='distancia', semilla=42, huella=None):
+        """
+        eligiendo landmarks por el metodo del mas lejano: cada nuevo landmark es el
+        aeropuerto alcanzable mas alejado de los que ya se eligieron.
+        huella identifica el grafo al cargar el indice; sin ella se usa huella_grafo
+        """
+        nodos = np.array(list(G.nodes), dtype=np.int64)
+        matriz = _matriz_csr(G, nodos, weight)
+        transpuesta = matriz.T.tocsr()
+
+        rng = np.random.default_rng(semilla)
+        inicio = int(rng.integers(len(nodos)))
+        lejania = dijkstra(matriz, indices=inicio) + dijkstra(transpuesta, indices=inicio)
+
+        landmarks, desde, hacia = [], [], []
+        minimos = np.full(len(nodos), np.inf)
+        for _ in range(min(n_landmarks, len(nodos))):
+            # solo consideramos aeropuertos conectados en ambos sentidos
+            candidatos = np.where(np.isfinite(lejania), lejania, -1)
+            candidatos[landmarks] = -1
+            landmark = int(np.argmax(candidatos))
+            if candidatos[landmark] < 0:
+                break
+            landmarks.append(landmark)
+            desde.append(dijkstra(matriz, indices=landmark))
+            hacia.append(dijkstra(transpuesta, indices=landmark))
+            minimos = np.minimum(minimos, desde[-1] + hacia[-1])
+            lejania = minimos
+
+        desde = np.nan_to_num(np.array(desde), posinf=_SIN_RUTA)
+        hacia = np.nan_to_num(np.array(hacia), posinf=_SIN_RUTA)
+        return cls(nodos, np.array(landmarks, dtype=np.int64), desde, hacia,
+                   matriz.indptr.astype(np.int64), matriz.indices.astype(np.int32), matriz.data,
+                   huella or _huella_csr(nodos, matriz))
+
+    def guardar(self, ruta):
+        np.savez(ruta, nodos=self.nodos, landmarks=self.landmarks, desde=self.desde, hacia=self.hacia,
+                 offsets=self.offsets, vecinos=self.vecinos, pesos=self.pesos, huella=np.array(self.huella or ""))
+
+    @classmethod
+    def cargar(cls, ruta, huella=None):
+        """
+        cargando el indice de disco. si se pasa huella (la de construir) se valida que
+        sea el mismo grafo con el que se construyo
+        """
+        datos = np.load(ruta)
+        guardada = str(datos["huella"]) if "huella" in datos else ""
+        if huella is not None and guardada != huella:
+            raise ValueError(f"El indice {ruta} no corresponde al grafo, hay que reconstruirlo")
+        huella = guardada
+        llaves = ('nodos', 'landmarks', 'desde', 'hacia', 'offsets', 'vecinos', 'pesos')
+        return cls(*(datos[llave] for llave in llaves), huella=huella)
+
+    def cotas_hacia(self, destino):
+        """
+        cota inferior de la distancia de cada aeropuerto al destino (arreglo por posicion)
+        """
+        t = self.posiciones[destino]
+        adelante = (self.desde[:, t, None] - self.desde).max(axis=0)
+        atras = (self.hacia - self.hacia[:, t, None]).max(axis=0)
+        return np.maximum(np.maximum(adelante, atras), 0.0)
+
+    def heuristica(self, destino):
+        """
+        funcion nodo -> cota inferior en km, para usar en A* sobre networkx
+        """
+        cotas = self.cotas_hacia(destino).tolist()
+        posiciones = self.posiciones
+        return lambda nodo: cotas[posiciones[nodo]]
+
+    def camino(self, origen, destino):
+        """
+        A* con las cotas de landmarks sobre la adyacencia del indice.
+        regresa (ruta_ids, nodos_expandidos) igual que buscar_camino
+        """
+        s = self.posiciones[origen]
+        t = self.posiciones[destino]
+        cotas = self.cotas_hacia(destino).tolist()
+        # cota superior pasando por el mejor landmark: ningun aeropuerto cuya cota
+        # inferior la rebase puede estar en la ruta optima, asi que ni se encola
+        limite = float((self.hacia[:, s] + self.desde[:, t]).min()) * (1 + 1e-9)
+        adyacencia = self._adyacencia
+        heappush, heappop = heapq.heappush, heapq.heappop
+        # costos y padres por posicion en listas: mas rapido que diccionarios
+        costos = [math.inf] * len(cotas)
+        padres = [-1] * len(cotas)
+        costos[s] = 0.0
+        abiertos = [(cotas[s], 0.0, s)]
+        expandidos = 0
+
+        while abiertos:
+            _, costo_u, u = heappop(abiertos)
+            if costo_u > costos[u]:
+                continue
+            expandidos += 1
+            if u == t:
+                ruta = [t]
+                while ruta[-1] != s:
+                    ruta.append(padres[ruta[-1]])
+                return self.nodos[ruta[::-1]].tolist(), expandidos
+
+            for v, w in adyacencia[u]:
+                nuevo = costo_u + w
+                if nuevo < costos[v]:
+                    estimado = nuevo + cotas[v]
+                    if estimado > limite:
+                        continue
+                    costos[v] = nuevo
+                    padres[v] = u
+                    heappush(abiertos, (estimado, nuevo, v))
+
+        raise nx.NetworkXNoPath(f"No hay camino entre {origen} y {destino}")
+
+
+def cargar_o_construir_indice(G, ruta="../data/indice_alt.npz", n_landmarks=16, huella=None):
+    """
+    cargando el indice ALT de disco; si no existe o esta desactualizado se construye y guarda.
+    huella identifica la version del grafo (por ejemplo la de la cache de datos, ver
+    cache_datos.cargar_indice_con_cache); sin ella se calcula huella_grafo(G)
+    """
+    if huella is None:
+        huella = huella_grafo(G)
+    if os.path.exists(ruta):
+        try:
+            indice = IndiceALT.cargar(ruta, huella)
+            print(f"Indice ALT cargado de {ruta}")
+            return indice
+        except ValueError as e:
+            print(e)
+
+    print(f"Construyendo indice ALT con {n_landmarks} landmarks...")
+    inicio = time.perf_counter()
+    indice = IndiceALT.construir(G, n_landmarks=n_landmarks, huella=huella)
+    print(f"Indice ALT construido en {time.perf_counter() - inicio:.2f}s")
+    directorio = os.path.dirname(ruta)
+    if directorio:
+        os.makedirs(directorio, exist_ok=True)
+    indice.guardar(ruta)
+    return indice
@@ -0,0 +1,120 @@
+import os
+import numpy as np
+import pandas as pd
+
+from activity4 import calcular_haversine_vectorizado
+
+COLS_ROUTES = ["airline", "airline_id", "source_airport", "source_airport_id",
+               "dest_airport", "dest_airport_id", "codeshare", "stops", "equipment"]
+
+
+class AlmacenAristas:
+    """
+    almacen incremental de aristas unicas (origen, destino) con su distancia y paradas.
+    cada bloque nuevo se mezcla con lo acumulado y se queda la ultima aparicion de
+    cada ruta (igual que networkx), asi que la memoria depende del numero de rutas
+    distintas y no del numero de filas del archivo
+    """
+    def __init__(self, df_airports):
+        self.ids = df_airports.index.to_numpy(dtype=np.int64)
+        self.indice = df_airports.index
+        self.lat = df_airports['latitude'].to_numpy(dtype=float)
+        self.lon = df_airports['longitude'].to_numpy(dtype=float)
+        # clave = posicion_origen * n + posicion_destino
+        self.claves = np.empty(0, dtype=np.int64)
+        self.distancias = np.empty(0, dtype=np.float64)
+        self.stops = np.empty(0, dtype=np.int8)
+        self.filas_leidas = 0
+        self.filas_validas = 0
+
+    def agregar_bloque(self, origenes, destinos, stops):
+        """
+        filtrando el bloque contra los aeropuertos validos, calculando sus distancias
+        y mezclandolo con las aristas acumuladas. regresa las aristas validas del bloque
+        """
+        self.filas_leidas += len(origenes)
+        pos_orig = self.indice.get_indexer(origenes)
+        pos_dest = self.indice.get_indexer(destinos)
+        validas = (pos_orig >= 0) & (pos_dest >= 0)
+        pos_orig = pos_orig[validas].astype(np.int64)
+        pos_dest = pos_dest[validas].astype(np.int64)
+        stops = stops[validas]
+        self.filas_validas += len(pos_orig)
+
+        distancias = calcular_haversine_vectorizado(
+            self.lat[pos_orig], self.lon[pos_orig], self.lat[pos_dest], self.lon[pos_dest]
+        )
+
+        claves = np.concatenate([self.claves, pos_orig * len(self.ids) + pos_dest])
+        todas_distancias = np.concatenate([self.distancias, distancias])
+        todos_stops = np.concatenate([self.stops, stops])
+        _, ultimas = np.unique(claves[::-1], return_index=True)
+        ultimas = len(claves) - 1 - ultimas
+        self.claves = claves[ultimas]
+        self.distancias = todas_distancias[ultimas]
+        self.stops = todos_stops[ultimas]
+
+        return {
+            'origen': self.ids[pos_orig],
+            'destino': self.ids[pos_dest],
+            'distancia': distancias,
+            'stops': stops
+        }
+
+    def aristas(self):
+        """
+        aristas acumuladas en el mismo formato que calcular_aristas (ordenadas por origen, destino)
+        """
+        n = len(self.ids)
+        return {
+            'origen': self.ids[self.claves // n],
+            'destino': self.ids[self.claves % n],
+            'distancia': self.distancias,
+            'stops': self.stops
+        }
+
+    def guardar(self, directorio):
+        """
+        guardando las aristas en .npy con los mismos nombres que la cache de cache_datos
+        """
+        os.makedirs(directorio, exist_ok=True)
+        for nombre, arreglo in self.aristas().items():
+            np.save(os.path.join(directorio, f"aristas_{nombre}.npy"), arreglo)
+
+
+def leer_rutas_por_bloques(ruta_routes, tamanio_bloque=1_000_000):
+    """
+    leyendo solo las columnas de ids y paradas de routes.dat en bloques, con la misma
+    limpieza que cargar_y_limpiar_datos (ids numericos, sin nulos)
+    """
+    lector = pd.read_csv(ruta_routes, header=None, names=COLS_ROUTES, sep=",", na_values='\\N',
+                         usecols=["source_airport_id", "dest_airport_id", "stops"],
+                         chunksize=tamanio_bloque)
+    for bloque in lector:
+        # el parser ya entrega numeros; to_numeric solo trabaja si el bloque trae basura
+        origenes = pd.to_numeric(bloque['source_airport_id'], errors='coerce').to_numpy()
+        destinos = pd.to_numeric(bloque['dest_airport_id'], errors='coerce').to_numpy()
+        stops = pd.to_numeric(bloque['stops'], errors='coerce').fillna(0).to_numpy(dtype=np.int8)
+        completas = ~(np.isnan(origenes) | np.isnan(destinos))
+        yield origenes[completas].astype(np.int64), destinos[completas].astype(np.int64), stops[completas]
+
+def ingerir_rutas_por_bloques(ruta_routes, df_airports, tamanio_bloque=1_000_000, grafo=None):
+    """
+    ingesta de archivos de rutas demasiado grandes para memoria: se leen por bloques,
+    se filtran contra los aeropuertos validos, se calculan las distancias del bloque y
+    se agregan las aristas al AlmacenAristas (y a grafo, si se pasa un GrafoVuelos con
+    los aeropuertos ya agregados). regresa el almacen
+    """
+    almacen = AlmacenAristas(df_airports)
+    for numero, (origenes, destinos, stops) in enumerate(leer_rutas_por_bloques(ruta_routes, tamanio_bloque), 1):
+        nuevas = almacen.agregar_bloque(origenes, destinos, stops)
+        if grafo is not None:
+            grafo.add_edges_from(
+                (origen, destino, {'distancia': distancia_km, 'stops': parada})
+                for origen, destino, distancia_km, parada in zip(
+                    nuevas['origen'].tolist(), nuevas['destino'].tolist(),
+                    nuevas['distancia'].tolist(), nuevas['stops'].tolist()
+                )
+            )
+        print(f"Bloque {numero}: {almacen.filas_leidas} filas leidas, {len(almacen.claves)} rutas unicas")
+    return almacen